@@ -2,6 +2,13 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from .db import init_app as init_db
+from .json_provider import init_app as init_json
+from .migrations import init_app as init_migrations
+from .services.catalog_version import CatalogVersion
+from .services.password_policy import PasswordHasher
+from .services.query_cache import QueryCache
+from .services.session_cache import SessionCache
+from .services.session_reaper import session_reaper, reap_sessions_command
 
 def create_app(test_config=None):
     # Create and configure the app
@@ -12,6 +19,57 @@ def create_app(test_config=None):
         SECRET_KEY='dev',
         DATABASE=os.path.join(app.root_path, '..', 'intelliwheels.db'),
         UPLOAD_FOLDER=os.path.join(app.root_path, '..', 'uploads'),
+        # 'background' warms models in a thread (health reports not ready until
+        # done), 'sync' blocks create_app, 'off' keeps lazy loading
+        MODEL_WARMUP=os.environ.get('MODEL_WARMUP', 'background'),
+        # In-process token -> user cache; size 0 disables it. SHARED publishes
+        # logouts, and role/account changes to users (triggers), through
+        # SQLite so every worker drops the affected tokens within a second.
+        # Without SHARED a cached user (role included) can be up to TTL
+        # seconds stale.
+        SESSION_CACHE_SIZE=int(os.environ.get('SESSION_CACHE_SIZE', 10000)),
+        SESSION_CACHE_TTL=int(os.environ.get('SESSION_CACHE_TTL', 60)),
+        SESSION_CACHE_SHARED=os.environ.get('SESSION_CACHE_SHARED', '1') == '1',
+        # Oldest sessions beyond this many per user are dropped at login
+        SESSION_MAX_PER_USER=int(os.environ.get('SESSION_MAX_PER_USER', 10)),
+        # Seconds between expired-session sweeps; each process (every gunicorn
+        # worker, via post_fork under preload_app) runs its own thread. 0 disables it.
+        SESSION_REAPER_INTERVAL=int(os.environ.get('SESSION_REAPER_INTERVAL', 3600)),
+        SESSION_REAPER_BATCH_SIZE=int(os.environ.get('SESSION_REAPER_BATCH_SIZE', 1000)),
+        # werkzeug method for new password hashes, e.g. "scrypt:32768:8:1" or
+        # "pbkdf2:sha256:600000"; older hashes are upgraded on login
+        PASSWORD_HASH_METHOD=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        # >0 runs hashing in a bounded thread pool of this size
+        PASSWORD_HASH_WORKERS=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)),
+        PASSWORD_HASH_MAX_PENDING=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64)),
+        # Idle SQLite connections kept per worker (0 opens one per request)
+        DB_POOL_SIZE=int(os.environ.get('DB_POOL_SIZE', 8)),
+        # PRAGMAs applied to every connection; empty string leaves SQLite's default.
+        # WAL lets readers proceed while a favorite/signup write is in flight.
+        DB_JOURNAL_MODE=os.environ.get('DB_JOURNAL_MODE', 'WAL'),
+        DB_SYNCHRONOUS=os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+        DB_BUSY_TIMEOUT=int(os.environ.get('DB_BUSY_TIMEOUT', 5000)),
+        DB_CACHE_SIZE=int(os.environ.get('DB_CACHE_SIZE', -16000)),
+        DB_MMAP_SIZE=int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024)),
+        DB_TEMP_STORE=os.environ.get('DB_TEMP_STORE', 'MEMORY'),
+        # Apply pending migrations at startup. With 0, deploys run `flask db upgrade`
+        # once and workers only read the schema version.
+        DB_AUTO_MIGRATE=os.environ.get('DB_AUTO_MIGRATE', '1') == '1',
+        # 'auto' uses orjson when installed, 'stdlib' forces the json module
+        JSON_BACKEND=os.environ.get('JSON_BACKEND', 'auto'),
+        # Catalog reads carry ETags built from a write counter each worker polls
+        # this often (seconds; 0 reads it per request). Cache-Control lets
+        # browsers revalidate every time and a CDN keep public pages briefly.
+        CATALOG_VERSION_POLL=float(os.environ.get('CATALOG_VERSION_POLL', 1.0)),
+        CATALOG_MAX_AGE=int(os.environ.get('CATALOG_MAX_AGE', 0)),
+        CATALOG_CDN_MAX_AGE=int(os.environ.get('CATALOG_CDN_MAX_AGE', 60)),
+        # Rendered /api/cars and /api/makes bodies kept per worker, bounded by
+        # bytes (0 disables). Entries are tied to the catalog version, so any
+        # write retires them. SHARED adds a SQLite file all workers read.
+        QUERY_CACHE_MAX_BYTES=int(os.environ.get('QUERY_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+        QUERY_CACHE_SHARED=os.environ.get('QUERY_CACHE_SHARED', '1') == '1',
+        QUERY_CACHE_SHARED_PATH=os.environ.get('QUERY_CACHE_SHARED_PATH'),
+        QUERY_CACHE_SHARED_MAX_ENTRIES=int(os.environ.get('QUERY_CACHE_SHARED_MAX_ENTRIES', 10000)),
     )
 
     if test_config is None:
@@ -29,7 +87,35 @@ def create_app(test_config=None):
 
     # Initialize extensions
     CORS(app, resources={r"/api/*": {"origins": "*"}})
+    init_json(app)
     init_db(app)
+    init_migrations(app)
+    app.extensions['session_cache'] = SessionCache(
+        maxsize=app.config['SESSION_CACHE_SIZE'],
+        ttl=app.config['SESSION_CACHE_TTL'],
+        shared=app.config['SESSION_CACHE_SHARED'],
+    )
+    app.extensions['catalog_version'] = CatalogVersion(
+        app.config['DATABASE'],
+        poll_interval=app.config['CATALOG_VERSION_POLL'],
+    )
+    shared_path = None
+    if app.config['QUERY_CACHE_SHARED']:
+        shared_path = app.config['QUERY_CACHE_SHARED_PATH'] or os.path.join(app.instance_path, 'query_cache.db')
+    app.extensions['query_cache'] = QueryCache(
+        max_bytes=app.config['QUERY_CACHE_MAX_BYTES'],
+        shared_path=shared_path,
+        shared_max_entries=app.config['QUERY_CACHE_SHARED_MAX_ENTRIES'],
+    )
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    )
+    session_reaper.batch_size = app.config['SESSION_REAPER_BATCH_SIZE']
+    session_reaper.interval = app.config['SESSION_REAPER_INTERVAL']
+    session_reaper.start(app.config['DATABASE'])
+    app.cli.add_command(reap_sessions_command)
 
     # Register Blueprints
     from .routes import cars, ai, system, auth, dealers, favorites, listings
@@ -41,6 +127,11 @@ def create_app(test_config=None):
     app.register_blueprint(favorites.bp)
     app.register_blueprint(listings.bp)
 
+    # Load models before the first request instead of on it
+    if app.config['MODEL_WARMUP'] != 'off':
+        from .services.ai_service import ai_service
+        ai_service.start_warm_up(background=app.config['MODEL_WARMUP'] != 'sync')
+
     return app
 
 # Expose app instance for 'gunicorn app:app'
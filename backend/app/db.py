@@ -1,100 +1,408 @@
 import sqlite3
 import os
+import queue
+import threading
+import click
 from flask import g, current_app
+from flask.cli import with_appcontext
+
+# Per-connection PRAGMAs, keyed by the config entry that overrides them.
+# journal_mode=WAL is persistent in the database file; the rest must be
+# applied to every new connection.
+PRAGMA_SETTINGS = (
+    ('DB_JOURNAL_MODE', 'journal_mode'),
+    ('DB_SYNCHRONOUS', 'synchronous'),
+    ('DB_BUSY_TIMEOUT', 'busy_timeout'),
+    ('DB_CACHE_SIZE', 'cache_size'),
+    ('DB_MMAP_SIZE', 'mmap_size'),
+    ('DB_TEMP_STORE', 'temp_store'),
+)
+
+def connect(db_path, pragmas=None):
+    """Open a connection with the row factory and PRAGMAs the app expects."""
+    # Autocommit is still managed by the sqlite3 module; check_same_thread is
+    # off because pooled connections move between request threads (never
+    # used by two at once).
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for name, value in (pragmas or {}).items():
+        if value is not None and value != '':
+            conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def pragmas_from_config(config):
+    return {pragma: config.get(key) for key, pragma in PRAGMA_SETTINGS}
+
+class ConnectionPool:
+    """Reuses SQLite connections across requests within one worker process.
+
+    Connections are created lazily up to ``size`` idle ones; a burst beyond
+    that opens extra connections which are closed when returned. The pool is
+    tied to the process that created its connections, so a worker forked from
+    a preloaded master starts with an empty pool instead of sharing the
+    master's file handles.
+    """
+
+    def __init__(self, db_path, size=8, pragmas=None):
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = pragmas or {}
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _check_pid(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Inherited connections belong to the parent; drop, don't close
+                self._idle = queue.LifoQueue(maxsize=self.size)
+                self._pid = os.getpid()
+
+    def acquire(self):
+        self._check_pid()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                self.created += 1
+            return connect(self.db_path, self.pragmas)
+        with self._lock:
+            self.reused += 1
+        return conn
+
+    def release(self, conn):
+        if os.getpid() != self._pid:
+            return
+        try:
+            # Never hand the next request a connection mid-transaction
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            with self._lock:
+                self.discarded += 1
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': self._idle.qsize(),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+            }
 
 def get_db():
     if 'db' not in g:
-        db_path = current_app.config['DATABASE']
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row
+        pool = current_app.extensions.get('db_pool')
+        if pool is not None:
+            g.db = pool.acquire()
+        else:
+            g.db = connect(current_app.config['DATABASE'], pragmas_from_config(current_app.config))
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
-    if db is not None:
+    if db is None:
+        return
+    pool = current_app.extensions.get('db_pool')
+    if pool is not None:
+        pool.release(db)
+    else:
         db.close()
 
-def init_db(app):
-    with app.app_context():
-        db = get_db()
-        cursor = db.cursor()
-        
-        # Enable foreign keys
-        cursor.execute("PRAGMA foreign_keys = ON")
-        
-        # Create Users Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT DEFAULT 'user',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create Sessions Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                token TEXT PRIMARY KEY,
-                user_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # Create Cars Table (Simplified schema based on earlier context)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS cars (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_id INTEGER,
-                make TEXT NOT NULL,
-                model TEXT NOT NULL,
-                year INTEGER,
-                price REAL,
-                currency TEXT DEFAULT 'JOD',
-                description TEXT,
-                specs JSON,
-                engines JSON,
-                statistics JSON,
-                gallery_images JSON,
-                media_gallery JSON,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create Dealers Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS dealers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                location TEXT,
-                rating REAL DEFAULT 0,
-                reviews_count INTEGER DEFAULT 0,
-                image_url TEXT,
-                contact_email TEXT,
-                contact_phone TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create Favorites Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS favorites (
-                user_id INTEGER NOT NULL,
-                car_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, car_id),
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
-                FOREIGN KEY (car_id) REFERENCES cars (id) ON DELETE CASCADE
-            )
-        ''')
-        
-        db.commit()
+# Searchable fields pulled out of the specs JSON blob. json_valid() guards keep
+# a malformed specs value from failing the write that fired the trigger.
+_FTS_COLUMNS = '''
+    new.id, new.make, new.model, new.description,
+    CASE WHEN json_valid(new.specs) THEN json_extract(new.specs, '$.bodyStyle') END,
+    CASE WHEN json_valid(new.specs) THEN json_extract(new.specs, '$.engine') END,
+    CASE WHEN json_valid(new.specs) THEN json_extract(new.specs, '$.class') END
+'''
+
+def init_search_index(cursor):
+    """Create the cars_fts full-text index and its sync triggers.
+
+    Returns False when the SQLite build has no FTS5, in which case search falls
+    back to LIKE matching.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cars_fts'"
+    ).fetchone()
+    if not exists:
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE cars_fts USING fts5(
+                    make, model, description, body_style, engine, class,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            ''')
+        except sqlite3.OperationalError:
+            return False
+        # Backfill rows that predate the index
+        cursor.execute(
+            "INSERT INTO cars_fts (rowid, make, model, description, body_style, engine, class) "
+            "SELECT " + _FTS_COLUMNS.replace('new.', '') + " FROM cars"
+        )
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cars_fts_ai AFTER INSERT ON cars BEGIN
+            INSERT INTO cars_fts (rowid, make, model, description, body_style, engine, class)
+            VALUES ({_FTS_COLUMNS});
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS cars_fts_ad AFTER DELETE ON cars BEGIN
+            DELETE FROM cars_fts WHERE rowid = old.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cars_fts_au AFTER UPDATE OF make, model, description, specs ON cars BEGIN
+            DELETE FROM cars_fts WHERE rowid = old.id;
+            INSERT INTO cars_fts (rowid, make, model, description, body_style, engine, class)
+            VALUES ({_FTS_COLUMNS});
+        END
+    ''')
+    return True
+
+# Hot spec fields denormalized out of the specs/engines JSON so list filters
+# can use plain indexes instead of json_extract over every row. Expressions
+# are formatted with the row alias ('new' in triggers, 'cars' for backfill).
+# SQLite can't add STORED generated columns to an existing table, and the
+# engine aggregates need subqueries, so triggers keep these in sync instead.
+_ENGINES = "json_each(CASE WHEN json_valid({0}.engines) AND json_type({0}.engines) = 'array' THEN {0}.engines END)"
+_SPEC_COLUMNS = (
+    ('body_style', 'TEXT COLLATE NOCASE', '''
+        CASE WHEN json_valid({0}.specs)
+             THEN NULLIF(TRIM(json_extract({0}.specs, '$.bodyStyle')), '') END
+    '''),
+    ('max_hp', 'REAL', f'''
+        COALESCE(
+            (SELECT MAX(NULLIF(CAST(COALESCE(json_extract(e.value, '$.powerHp'),
+                                             json_extract(e.value, '$.horsepower')) AS REAL), 0))
+             FROM {_ENGINES} e WHERE e.type = 'object'),
+            CASE WHEN json_valid({{0}}.specs)
+                 THEN NULLIF(CAST(json_extract({{0}}.specs, '$.horsepower') AS REAL), 0) END
+        )
+    '''),
+    # Best (lowest) consumption across engines, in L/100km
+    ('min_fuel_l_100km', 'REAL', f'''
+        (SELECT MIN(COALESCE(
+                    NULLIF(CAST(json_extract(e.value, '$.fuelEconomyLPer100km') AS REAL), 0),
+                    100.0 / NULLIF(CAST(json_extract(e.value, '$.fuelEconomyKmPerL') AS REAL), 0)))
+         FROM {_ENGINES} e WHERE e.type = 'object')
+    '''),
+)
+
+def init_spec_columns(db):
+    """Add the denormalized spec columns, their indexes and sync triggers, then backfill."""
+    cursor = db.cursor()
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(cars)')}
+    for name, definition, _ in _SPEC_COLUMNS:
+        if name not in columns:
+            cursor.execute(f'ALTER TABLE cars ADD COLUMN {name} {definition}')
+
+    assignments = ', '.join(f'{name} = {expr.format("new")}' for name, _, expr in _SPEC_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cars_specs_ai AFTER INSERT ON cars BEGIN
+            UPDATE cars SET {assignments} WHERE id = new.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS cars_specs_au AFTER UPDATE OF specs, engines ON cars BEGIN
+            UPDATE cars SET {assignments} WHERE id = new.id;
+        END
+    ''')
+    cursor.execute(
+        'UPDATE cars SET ' + ', '.join(f'{name} = {expr.format("cars")}' for name, _, expr in _SPEC_COLUMNS)
+    )
+
+    # Equality on body style keeps the default (created_at, id) order index-only
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cars_body_style_created_at_id
+        ON cars (body_style, created_at, id)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_max_hp ON cars (max_hp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_min_fuel ON cars (min_fuel_l_100km)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_rating ON cars (rating)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_year ON cars (year)')
+
+# Materialized aggregates behind /api/analytics/insights. Triggers keep them in
+# step with every write, so the dashboard reads a handful of small rows instead
+# of scanning cars.
+_PRICE_BUCKET = '''
+    CASE
+        WHEN {0}.price IS NULL OR {0}.price <= 0 THEN -1
+        WHEN {0}.price < 10000 THEN 0
+        WHEN {0}.price < 30000 THEN 1
+        WHEN {0}.price < 60000 THEN 2
+        ELSE 3
+    END
+'''
+_LISTING_MONTH = "COALESCE(strftime('%Y-%m', {0}.created_at), 'unknown')"
+
+ANALYTICS_TABLES = ('analytics_make_stats', 'analytics_price_buckets',
+                    'analytics_monthly_listings', 'analytics_car_favorites')
+
+def _analytics_add(row):
+    return f'''
+        INSERT INTO analytics_make_stats (make, listings, priced, price_sum)
+        VALUES ({row}.make, 1, COALESCE({row}.price, 0) > 0,
+                CASE WHEN {row}.price > 0 THEN {row}.price ELSE 0 END)
+        ON CONFLICT (make) DO UPDATE SET
+            listings = listings + 1,
+            priced = priced + excluded.priced,
+            price_sum = price_sum + excluded.price_sum;
+        INSERT INTO analytics_price_buckets (bucket, listings)
+        VALUES ({_PRICE_BUCKET.format(row)}, 1)
+        ON CONFLICT (bucket) DO UPDATE SET listings = listings + 1;
+        INSERT INTO analytics_monthly_listings (month, listings)
+        VALUES ({_LISTING_MONTH.format(row)}, 1)
+        ON CONFLICT (month) DO UPDATE SET listings = listings + 1;
+    '''
+
+def _analytics_remove(row):
+    return f'''
+        UPDATE analytics_make_stats SET
+            listings = listings - 1,
+            priced = priced - (COALESCE({row}.price, 0) > 0),
+            price_sum = price_sum - CASE WHEN {row}.price > 0 THEN {row}.price ELSE 0 END
+        WHERE make = {row}.make;
+        DELETE FROM analytics_make_stats WHERE make = {row}.make AND listings <= 0;
+        UPDATE analytics_price_buckets SET listings = listings - 1
+        WHERE bucket = {_PRICE_BUCKET.format(row)};
+        UPDATE analytics_monthly_listings SET listings = listings - 1
+        WHERE month = {_LISTING_MONTH.format(row)};
+    '''
+
+def refresh_analytics(db):
+    """Rebuild every analytics aggregate from scratch; the caller commits.
+
+    Triggers keep the tables current; this is for backfilling an existing
+    database or repairing drift after writes made without the triggers.
+    """
+    for table in ANALYTICS_TABLES:
+        db.execute(f"DELETE FROM {table}")
+    db.execute('''
+        INSERT INTO analytics_make_stats (make, listings, priced, price_sum)
+        SELECT make, COUNT(*), COUNT(CASE WHEN price > 0 THEN 1 END), TOTAL(CASE WHEN price > 0 THEN price END)
+        FROM cars GROUP BY make
+    ''')
+    db.execute(f'''
+        INSERT INTO analytics_price_buckets (bucket, listings)
+        SELECT {_PRICE_BUCKET.format('cars')}, COUNT(*) FROM cars GROUP BY 1
+    ''')
+    db.execute(f'''
+        INSERT INTO analytics_monthly_listings (month, listings)
+        SELECT {_LISTING_MONTH.format('cars')}, COUNT(*) FROM cars GROUP BY 1
+    ''')
+    db.execute('''
+        INSERT INTO analytics_car_favorites (car_id, favorites)
+        SELECT car_id, COUNT(*) FROM favorites GROUP BY car_id
+    ''')
+
+def init_analytics(db):
+    """Create the analytics tables and triggers, backfilling on first run."""
+    cursor = db.cursor()
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analytics_make_stats'"
+    ).fetchone()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_make_stats (
+            make TEXT PRIMARY KEY,
+            listings INTEGER NOT NULL DEFAULT 0,
+            priced INTEGER NOT NULL DEFAULT 0,
+            price_sum REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_price_buckets (
+            bucket INTEGER PRIMARY KEY,
+            listings INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_monthly_listings (
+            month TEXT PRIMARY KEY,
+            listings INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_car_favorites (
+            car_id INTEGER PRIMARY KEY,
+            favorites INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_analytics_car_favorites_count
+        ON analytics_car_favorites (favorites)
+    ''')
+    # min/max price are read straight off this index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cars_price ON cars (price)")
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS analytics_cars_ai AFTER INSERT ON cars BEGIN
+            {_analytics_add('new')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS analytics_cars_ad AFTER DELETE ON cars BEGIN
+            {_analytics_remove('old')}
+            DELETE FROM analytics_car_favorites WHERE car_id = old.id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS analytics_cars_au AFTER UPDATE OF make, price, created_at ON cars BEGIN
+            {_analytics_remove('old')}
+            {_analytics_add('new')}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS analytics_favorites_ai AFTER INSERT ON favorites BEGIN
+            INSERT INTO analytics_car_favorites (car_id, favorites) VALUES (new.car_id, 1)
+            ON CONFLICT (car_id) DO UPDATE SET favorites = favorites + 1;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS analytics_favorites_ad AFTER DELETE ON favorites BEGIN
+            UPDATE analytics_car_favorites SET favorites = favorites - 1 WHERE car_id = old.car_id;
+            DELETE FROM analytics_car_favorites WHERE car_id = old.car_id AND favorites <= 0;
+        END
+    ''')
+
+    if not exists:
+        refresh_analytics(db)
+
+@click.command('refresh-analytics')
+@with_appcontext
+def refresh_analytics_command():
+    """Rebuild the materialized analytics tables from cars and favorites."""
+    db = get_db()
+    refresh_analytics(db)
+    db.commit()
+    click.echo('Refreshed analytics aggregates.')
 
 def init_app(app):
+    if app.config['DB_POOL_SIZE'] > 0:
+        app.extensions['db_pool'] = ConnectionPool(
+            app.config['DATABASE'],
+            size=app.config['DB_POOL_SIZE'],
+            pragmas=pragmas_from_config(app.config),
+        )
     app.teardown_appcontext(close_db)
-    init_db(app)
+    app.cli.add_command(refresh_analytics_command)
@@ -0,0 +1,350 @@
+import sqlite3
+import click
+from flask.cli import AppGroup
+from .db import get_db, init_search_index, init_spec_columns, init_analytics
+
+# Forward-only schema migrations. Each entry runs once, in its own
+# BEGIN IMMEDIATE transaction, and is recorded in schema_version. Never edit
+# a migration that has shipped; append a new one instead.
+MIGRATIONS = []
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+# Columns cars must have. Databases created by an older db.py (owner_id, no
+# media/rating columns) or by ingest_excel_to_db.py (no description) are
+# brought up to this set by ALTER TABLE.
+_CAR_COLUMNS = (
+    ('user_id', 'INTEGER'),
+    ('description', 'TEXT'),
+    ('image_url', 'TEXT'),
+    ('image_urls', 'JSON'),
+    ('gallery_images', 'JSON'),
+    ('media_gallery', 'JSON'),
+    ('video_url', 'TEXT'),
+    ('rating', 'REAL DEFAULT 0.0'),
+    ('reviews', 'INTEGER DEFAULT 0'),
+    ('specs', 'JSON'),
+    ('engines', 'JSON'),
+    ('statistics', 'JSON'),
+    ('source_sheets', 'JSON'),
+    ('latitude', 'REAL'),
+    ('longitude', 'REAL'),
+)
+
+@migration(1, 'Core tables: users, sessions, cars, dealers, favorites')
+def _core_tables(db):
+    cursor = db.cursor()
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT DEFAULT 'user',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            token TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    ''')
+    # Per-user lookups (session cap) and the expired-session reaper
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_sessions_user_expires
+        ON user_sessions (user_id, expires_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_sessions_expires
+        ON user_sessions (expires_at)
+    ''')
+
+    # Logouts published to every worker's session cache (see services/session_cache.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_hash TEXT NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Same columns as ingest_excel_to_db.py creates, plus description
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            make TEXT NOT NULL,
+            model TEXT NOT NULL,
+            year INTEGER,
+            price REAL,
+            currency TEXT DEFAULT 'AED',
+            description TEXT,
+            image_url TEXT,
+            image_urls JSON,
+            gallery_images JSON,
+            media_gallery JSON,
+            video_url TEXT,
+            rating REAL DEFAULT 0.0,
+            reviews INTEGER DEFAULT 0,
+            specs JSON,
+            engines JSON,
+            statistics JSON,
+            source_sheets JSON,
+            latitude REAL,
+            longitude REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(cars)')}
+    for name, definition in _CAR_COLUMNS:
+        if name not in columns:
+            cursor.execute(f'ALTER TABLE cars ADD COLUMN {name} {definition}')
+    # Older app databases recorded the owner as owner_id; the ingest script and
+    # everything else use user_id
+    if 'owner_id' in columns:
+        cursor.execute('UPDATE cars SET user_id = owner_id WHERE user_id IS NULL AND owner_id IS NOT NULL')
+        cursor.execute('ALTER TABLE cars DROP COLUMN owner_id')
+
+    # Keyset pagination indexes: (created_at, id) is the cursor order for
+    # GET /api/cars, with and without the make filter.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cars_created_at_id
+        ON cars (created_at, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_cars_make_created_at_id
+        ON cars (make, created_at, id)
+    ''')
+    # GET /api/my-listings
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_user_id ON cars (user_id)')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dealers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            location TEXT,
+            rating REAL DEFAULT 0,
+            reviews_count INTEGER DEFAULT 0,
+            image_url TEXT,
+            contact_email TEXT,
+            contact_phone TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS favorites (
+            user_id INTEGER NOT NULL,
+            car_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, car_id),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            FOREIGN KEY (car_id) REFERENCES cars (id) ON DELETE CASCADE
+        )
+    ''')
+
+@migration(2, 'Full-text search index over cars')
+def _search_index(db):
+    # No-op on SQLite builds without FTS5; search then falls back to LIKE
+    init_search_index(db.cursor())
+
+@migration(3, 'Materialized analytics aggregates')
+def _analytics(db):
+    init_analytics(db)
+
+@migration(4, 'Indexed spec columns: body style, max horsepower, best fuel economy')
+def _spec_columns(db):
+    cursor = db.cursor()
+    # The FTS update trigger used to fire on any column; limit it to indexed
+    # ones so maintaining the new columns doesn't re-index every written row
+    fts = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cars_fts'"
+    ).fetchone()
+    if fts:
+        cursor.execute('DROP TRIGGER IF EXISTS cars_fts_au')
+        init_search_index(cursor)
+    init_spec_columns(db)
+
+@migration(5, 'Make-scoped sort indexes for price, year and rating')
+def _sort_indexes(db):
+    # The single-column indexes from migrations 3-4 end in the rowid, so they
+    # already serve the unscoped sorts; these serve "make = X ORDER BY column, id"
+    cursor = db.cursor()
+    for column in ('price', 'year', 'rating'):
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_cars_make_{column}_id
+            ON cars (make, {column}, id)
+        ''')
+
+@migration(6, 'Catalog version counter bumped by writes to cars and dealers')
+def _catalog_version(db):
+    # Backs the ETags on catalog reads (services/catalog_version.py). Triggers
+    # catch every writer, including ingest_excel_to_db.py.
+    cursor = db.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)')
+    for table in ('cars', 'dealers'):
+        for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS catalog_version_{table}_{suffix}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+@migration(7, 'Maintain cars.updated_at on edits and index it for incremental export')
+def _updated_at(db):
+    # Only user-editable columns count as an edit: the spec-column trigger
+    # rewrites body_style/max_hp/min_fuel_l_100km on every insert, and those
+    # updates shouldn't touch updated_at a second time.
+    cursor = db.cursor()
+    cursor.execute('''
+        UPDATE cars SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)
+        WHERE updated_at IS NULL
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS cars_updated_at_au
+        AFTER UPDATE OF user_id, make, model, year, price, currency, description,
+                        image_url, image_urls, gallery_images, media_gallery, video_url,
+                        rating, reviews, specs, engines, statistics, source_sheets,
+                        latitude, longitude
+        ON cars WHEN NEW.updated_at IS OLD.updated_at BEGIN
+            UPDATE cars SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cars_updated_at_id ON cars (updated_at, id)')
+
+@migration(8, 'Analytics triggers accept listings without a price')
+def _analytics_null_price(db):
+    # "price > 0" is NULL for an unpriced car, which the NOT NULL priced column
+    # rejected, failing the insert itself. Recreate the cars triggers from the
+    # fixed definitions in db.py.
+    cursor = db.cursor()
+    for suffix in ('ai', 'ad', 'au'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS analytics_cars_{suffix}')
+    init_analytics(db)
+
+@migration(9, "Revoke a user's cached sessions when their role or account changes")
+def _user_revocations(db):
+    # Roles are changed outside the API (plain SQL), so triggers publish the
+    # change: a session_revocations row with user_id set drops every cached
+    # token of that user (see SessionCache.sync_revocations).
+    cursor = db.cursor()
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(session_revocations)')}
+    if 'user_id' not in columns:
+        cursor.execute('ALTER TABLE session_revocations ADD COLUMN user_id INTEGER')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_revoke_sessions_au
+        AFTER UPDATE OF username, email, role ON users
+        WHEN OLD.username IS NOT NEW.username OR OLD.email IS NOT NEW.email OR OLD.role IS NOT NEW.role
+        BEGIN
+            INSERT INTO session_revocations (token_hash, user_id) VALUES ('', OLD.id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_revoke_sessions_ad AFTER DELETE ON users BEGIN
+            INSERT INTO session_revocations (token_hash, user_id) VALUES ('', OLD.id);
+        END
+    ''')
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def current_version(db):
+    """Highest applied migration, or 0 for a database that predates versioning."""
+    try:
+        return db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+def upgrade(db, target=None):
+    """Apply pending migrations up to ``target`` (default: all). Returns the versions applied.
+
+    Safe to run from several processes at once: each migration takes the
+    write lock first and re-checks the version, so it is applied exactly once.
+    """
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.commit()
+
+    applied = []
+    for version, description, apply in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(db) >= version:
+                db.rollback()
+                continue
+            apply(db)
+            db.execute(
+                'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                (version, description)
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+def check_schema(app):
+    """Startup check: read the schema version and upgrade only if allowed and behind."""
+    with app.app_context():
+        db = get_db()
+        version = current_version(db)
+        if version < SCHEMA_VERSION and app.config['DB_AUTO_MIGRATE']:
+            upgrade(db)
+            version = current_version(db)
+        if version < SCHEMA_VERSION:
+            print(f"Database schema is at version {version}, expected {SCHEMA_VERSION}; "
+                  f"run `flask db upgrade`")
+        app.config['SCHEMA_VERSION'] = version
+        app.config['SEARCH_FTS'] = db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cars_fts'"
+        ).fetchone() is not None
+
+db_cli = AppGroup('db', help='Database schema migrations.')
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, default=None, help='Stop after this version.')
+def upgrade_command(target):
+    """Apply pending schema migrations."""
+    applied = upgrade(get_db(), target)
+    for version, description, _ in MIGRATIONS:
+        if version in applied:
+            click.echo(f'Applied {version}: {description}')
+    click.echo(f'Schema is at version {current_version(get_db())} (latest {SCHEMA_VERSION}).')
+
+@db_cli.command('current')
+def current_command():
+    """Show the applied schema version and any pending migrations."""
+    version = current_version(get_db())
+    click.echo(f'Schema is at version {version} (latest {SCHEMA_VERSION}).')
+    for pending, description, _ in MIGRATIONS:
+        if pending > version:
+            click.echo(f'Pending {pending}: {description}')
+
+def init_app(app):
+    app.cli.add_command(db_cli)
+    check_schema(app)
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from ..services.ai_service import ai_service
+from ..db import get_db
+from ..services.analytics_service import get_insights
+from ..services.ai_service import ai_service, price_features, PRICE_CURRENCY
 
 bp = Blueprint('ai', __name__, url_prefix='/api')
 
+MAX_PRICE_BATCH = 5000
+
 @bp.route('/chatbot', methods=['POST'])
 def chatbot():
     data = request.json
@@ -15,14 +19,56 @@ def chatbot():
 
 @bp.route('/price-estimate', methods=['POST'])
 def price_estimate():
-    data = request.json
-    price = ai_service.estimate_price(
-        data.get('make'),
-        data.get('model'),
-        data.get('year'),
-        data.get('specs')
-    )
-    return jsonify({'success': True, 'estimate': price})
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object describing the listing'}), 400
+    try:
+        price = ai_service.estimate_price(data)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if price is None:
+        return jsonify({'success': False, 'error': 'Price model unavailable'}), 503
+    return jsonify({
+        'success': True,
+        'estimate': price,
+        'currency': PRICE_CURRENCY,
+        'range': ai_service.price_range(price)
+    })
+
+@bp.route('/price-estimate/batch', methods=['POST'])
+def price_estimate_batch():
+    data = request.get_json(silent=True)
+    listings = data.get('listings') if isinstance(data, dict) else data
+    if not isinstance(listings, list):
+        return jsonify({'success': False, 'error': 'listings must be a list'}), 400
+    if len(listings) > MAX_PRICE_BATCH:
+        return jsonify({'success': False, 'error': f'At most {MAX_PRICE_BATCH} listings per batch'}), 413
+
+    # Validate everything first, then score all valid rows in a single predict call
+    results = [None] * len(listings)
+    rows, positions = [], []
+    for idx, listing in enumerate(listings):
+        if not isinstance(listing, dict):
+            results[idx] = {'estimate': None, 'error': 'Listing must be an object'}
+            continue
+        try:
+            rows.append(price_features(listing))
+            positions.append(idx)
+        except ValueError as e:
+            results[idx] = {'estimate': None, 'error': str(e)}
+
+    # Nothing to score (an empty batch, or only invalid rows) needs no model
+    estimates = ai_service.estimate_prices(rows) if rows else []
+    if estimates is None:
+        return jsonify({'success': False, 'error': 'Price model unavailable'}), 503
+    for idx, price in zip(positions, estimates):
+        results[idx] = {'estimate': price, 'range': ai_service.price_range(price)}
+
+    return jsonify({'success': True, 'currency': PRICE_CURRENCY, 'estimates': results})
+
+@bp.route('/price-estimate/stats', methods=['GET'])
+def price_estimate_stats():
+    return jsonify({'success': True, 'cache': ai_service.price_cache.stats()})
 
 @bp.route('/semantic-search', methods=['GET'])
 def semantic_search():
@@ -48,33 +94,5 @@ def listing_assistant():
 
 @bp.route('/analytics/insights', methods=['GET'])
 def analytics_insights():
-    # Return mock/aggregated insights for now
-    insights = {
-        'summary': {
-            'currency': 'JOD',
-            'average_price': 25000,
-            'min_price': 5000,
-            'max_price': 150000,
-            'total_listings': 42,
-            'favorites_count': 12
-        },
-        'market_top_makes': [
-            {'make': 'Toyota', 'avg_price': 22000, 'listings': 15},
-            {'make': 'BMW', 'avg_price': 45000, 'listings': 8},
-            {'make': 'Mercedes', 'avg_price': 52000, 'listings': 6}
-        ],
-        'price_distribution': [
-            {'bucket': '< 10k', 'count': 5},
-            {'bucket': '10k-30k', 'count': 20},
-            {'bucket': '30k-60k', 'count': 10},
-            {'bucket': '> 60k', 'count': 7}
-        ],
-        'growth_trends': [
-            {'label': 'Jan', 'value': 10},
-            {'label': 'Feb', 'value': 15},
-            {'label': 'Mar', 'value': 25},
-            {'label': 'Apr', 'value': 42}
-        ],
-        'watchlist': []
-    }
+    insights = get_insights(get_db())
     return jsonify({'success': True, 'insights': insights})
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, g
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, g, current_app
 from ..db import get_db
+from ..services.password_policy import HasherBusy
+from ..services.session_cache import hash_token
+from ..services.session_reaper import session_reaper
 import secrets
 import sqlite3
 from datetime import datetime, timedelta
@@ -10,29 +12,70 @@ bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 def generate_token():
     return secrets.token_urlsafe(32)
 
+def get_session_cache():
+    return current_app.extensions['session_cache']
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
 def get_user_from_token(token):
     if not token:
         return None
     
     db = get_db()
+    cache = get_session_cache()
+    token_hash = None
+    if cache.enabled:
+        cache.sync_revocations(db)
+        token_hash = hash_token(token)
+        user = cache.get(token_hash)
+        if user is not None:
+            return dict(user)
+
     # Check for valid session
     row = db.execute('''
-        SELECT u.id, u.username, u.email, u.role, u.created_at
+        SELECT u.id, u.username, u.email, u.role, u.created_at, s.expires_at
         FROM users u
         JOIN user_sessions s ON u.id = s.user_id
         WHERE s.token = ? AND (s.expires_at IS NULL OR s.expires_at > CURRENT_TIMESTAMP)
     ''', (token,)).fetchone()
     
     if row:
-        return {
+        user = {
             'id': row['id'],
             'username': row['username'],
             'email': row['email'],
             'role': row['role'],
             'created_at': row['created_at']
         }
+        if token_hash:
+            cache.put(token_hash, user, row['expires_at'])
+        return dict(user)
     return None
 
+def create_session(db, user_id):
+    """Insert a new session and drop the user's oldest ones beyond the cap."""
+    token = generate_token()
+    expires_at = datetime.utcnow() + timedelta(days=7)
+    db.execute(
+        'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+        (token, user_id, expires_at)
+    )
+
+    cap = current_app.config['SESSION_MAX_PER_USER']
+    if cap > 0:
+        stale = db.execute('''
+            SELECT token FROM user_sessions
+            WHERE user_id = ?
+            ORDER BY expires_at DESC
+            LIMIT -1 OFFSET ?
+        ''', (user_id, cap)).fetchall()
+        cache = get_session_cache()
+        for row in stale:
+            db.execute('DELETE FROM user_sessions WHERE token = ?', (row['token'],))
+            cache.record_revocation(db, hash_token(row['token']))
+    return token
+
 @bp.route('/signup', methods=['POST'])
 def signup():
     data = request.json
@@ -45,7 +88,7 @@ def signup():
 
     db = get_db()
     try:
-        password_hash = generate_password_hash(password)
+        password_hash = get_password_hasher().hash(password)
         cursor = db.execute(
             'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
             (username, email, password_hash)
@@ -53,12 +96,7 @@ def signup():
         user_id = cursor.lastrowid
         
         # Create session
-        token = generate_token()
-        expires_at = datetime.utcnow() + timedelta(days=7)
-        db.execute(
-            'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
-            (token, user_id, expires_at)
-        )
+        token = create_session(db, user_id)
         db.commit()
 
         return jsonify({
@@ -74,6 +112,8 @@ def signup():
 
     except sqlite3.IntegrityError:
         return jsonify({'success': False, 'error': 'Username or email already exists'}), 409
+    except HasherBusy:
+        return jsonify({'success': False, 'error': 'Server busy, please retry'}), 503
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -85,15 +125,21 @@ def login():
 
     db = get_db()
     user = db.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+    hasher = get_password_hasher()
 
-    if user and check_password_hash(user['password_hash'], password):
-        token = generate_token()
-        expires_at = datetime.utcnow() + timedelta(days=7)
-        
-        db.execute(
-            'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
-            (token, user['id'], expires_at)
-        )
+    try:
+        valid = bool(user and password) and hasher.verify(user['password_hash'], password)
+        # Upgrade hashes made under an older policy while we have the plaintext
+        if valid and hasher.needs_rehash(user['password_hash']):
+            db.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ?',
+                (hasher.hash(password), user['id'])
+            )
+    except HasherBusy:
+        return jsonify({'success': False, 'error': 'Server busy, please retry'}), 503
+
+    if valid:
+        token = create_session(db, user['id'])
         db.commit()
 
         return jsonify({
@@ -115,6 +161,7 @@ def logout():
     if token:
         db = get_db()
         db.execute('DELETE FROM user_sessions WHERE token = ?', (token,))
+        get_session_cache().record_revocation(db, hash_token(token))
         db.commit()
     return jsonify({'success': True})
 
@@ -126,3 +173,25 @@ def verify_session():
     if user:
         return jsonify({'success': True, 'user': user})
     return jsonify({'success': False, 'error': 'Invalid or expired token'}), 401
+
+@bp.route('/sessions/stats', methods=['GET'])
+def session_stats():
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user = get_user_from_token(token)
+    if not user:
+        return jsonify({'success': False, 'error': 'Authentication required'}), 401
+    if user['role'] != 'admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+
+    # The total comes from the reaper's last run rather than a COUNT(*) over
+    # the whole table per call; expired rows are a range on
+    # idx_user_sessions_expires, and the reaper keeps that range short.
+    expired = get_db().execute(
+        'SELECT COUNT(*) FROM user_sessions WHERE expires_at <= CURRENT_TIMESTAMP'
+    ).fetchone()[0]
+    return jsonify({
+        'success': True,
+        'sessions': {'total': session_reaper.last_table_size, 'expired': expired},
+        'reaper': session_reaper.stats(),
+        'cache': get_session_cache().stats()
+    })
@@ -1,14 +1,25 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from ..db import get_db
+from .auth import get_user_from_token
+from ..services.car_projection import JSON_FIELDS, parse_fields, select_list, cars_response
+from ..services.catalog_export import EXPORT_FORMATS, export_chunks, gzip_chunks, parse_since
+from ..services.catalog_version import conditional_get, get_catalog_version
+from ..services.query_cache import cached_query, get_query_cache
+import base64
 import json
+import math
+import re
 import sqlite3
 
 bp = Blueprint('cars', __name__, url_prefix='/api/cars')
 
+# bm25 column weights for cars_fts: make, model, description, body_style, engine, class
+FTS_WEIGHTS = '10.0, 10.0, 1.0, 3.0, 2.0, 2.0'
+
 def car_row_to_dict(row):
     """Helper to convert DB row to dictionary with parsed JSON fields."""
     d = dict(row)
-    for field in ['specs', 'engines', 'statistics', 'gallery_images', 'media_gallery']:
+    for field in JSON_FIELDS:
         if d.get(field):
             try:
                 d[field] = json.loads(d[field])
@@ -16,36 +27,267 @@ def car_row_to_dict(row):
                 d[field] = None
     return d
 
+# GET /api/cars sort modes (the frontend's SortOption values): sort column and
+# direction. Rows tie-break on id in the same direction, and every mode has a
+# (column, id) and a (make, column, id) index so paging never sorts.
+SORT_MODES = {
+    'newest': ('created_at', 'DESC'),
+    'price-asc': ('price', 'ASC'),
+    'price-desc': ('price', 'DESC'),
+    'year-desc': ('year', 'DESC'),
+    'rating-desc': ('rating', 'DESC'),
+}
+DEFAULT_SORT = 'newest'
+
+def encode_cursor(row, sort=DEFAULT_SORT):
+    """Encode the (sort value, id) position of a row as an opaque cursor."""
+    column, _ = SORT_MODES[sort]
+    position = [row[column], row['id']]
+    if sort != DEFAULT_SORT:
+        position.append(sort)
+    raw = json.dumps(position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decode a cursor produced by encode_cursor into (value, id, sort).
+
+    A None value marks a position among the listings with no sort value.
+    Raises ValueError if malformed.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value, car_id = position[:2]
+        sort = position[2] if len(position) > 2 else DEFAULT_SORT
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(car_id, int) or sort not in SORT_MODES:
+        raise ValueError('Invalid cursor')
+    return value, car_id, sort
+
+# GET /api/cars filter parameters: (name, predicate, type, range index). Spec
+# columns are kept in sync from the JSON by db.init_spec_columns.
+LIST_FILTERS = (
+    ('body_style', 'c.body_style = ?', str, None),
+    ('min_hp', 'c.max_hp >= ?', float, 'idx_cars_max_hp'),
+    ('max_fuel', 'c.min_fuel_l_100km <= ?', float, 'idx_cars_min_fuel'),
+    ('min_rating', 'c.rating >= ?', float, 'idx_cars_rating'),
+    ('price_min', 'c.price >= ?', float, 'idx_cars_price'),
+    ('price_max', 'c.price <= ?', float, 'idx_cars_price'),
+    ('year_min', 'c.year >= ?', int, 'idx_cars_year'),
+    ('year_max', 'c.year <= ?', int, 'idx_cars_year'),
+)
+# A range index is forced only when it matches fewer rows than this
+RANGE_PROBE_LIMIT = 1000
+MAX_CAR_BATCH = 5000
+# Stands in for an NDJSON line that isn't valid JSON
+_MALFORMED_LINE = object()
+
+def parse_filters(args):
+    """Return (predicate, value, index) for the filters present. Raises ValueError on bad input."""
+    filters = []
+    for name, predicate, cast, index in LIST_FILTERS:
+        raw = args.get(name, '').strip()
+        if not raw or raw == 'all':
+            continue
+        try:
+            filters.append((predicate, cast(raw), index))
+        except ValueError:
+            raise ValueError(f'Invalid {name}: {raw}')
+    return filters
+
+def pick_range_index(db, filters):
+    """Return the range index to drive the listing query from, or None.
+
+    With ORDER BY created_at ... LIMIT, SQLite walks the created_at index and
+    filters, which is right for common values but walks most of the table for
+    rare ones (say price_max just above the cheapest car). Counting up to
+    RANGE_PROBE_LIMIT matches on each range index tells the cases apart; a
+    small match set is cheaper to fetch by range and sort.
+    """
+    ranges = {}
+    for predicate, value, index in filters:
+        if index:
+            predicates, values = ranges.setdefault(index, ([], []))
+            predicates.append(predicate)
+            values.append(value)
+
+    best, best_count = None, RANGE_PROBE_LIMIT
+    for index, (predicates, values) in ranges.items():
+        count = db.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM cars c INDEXED BY {index} "
+            f"WHERE {' AND '.join(predicates)} LIMIT ?)",
+            values + [RANGE_PROBE_LIMIT]
+        ).fetchone()[0]
+        if count < best_count:
+            best, best_count = index, count
+    return best
+
+def fetch_sorted(db, query, params, sort_column, direction, limit, offset=0, after=None):
+    """Run a listing query for one page in (sort value, id) order.
+
+    ``after`` is a decoded cursor position (value, id); without one, ``offset``
+    applies. Listings with no price/year/rating sort after all the others.
+    A row-value seek can't step past NULLs, so they are a second segment read
+    in id order from the same index (each sort index ends in the id), once
+    the valued segment runs out. created_at is always set and takes one seek.
+    """
+    comparison = '<' if direction == 'DESC' else '>'
+    seek, seek_params = '', []
+    if after and after[0] is not None:
+        seek, seek_params = f" AND (c.{sort_column}, c.id) {comparison} (?, ?)", list(after)
+    order_by = f" ORDER BY c.{sort_column} {direction}, c.id {direction} LIMIT ? OFFSET ?"
+    if sort_column == 'created_at':
+        return db.execute(query + seek + order_by, params + seek_params + [limit, offset]).fetchall()
+
+    rows = []
+    if not after or after[0] is not None:
+        valued = f"{query} AND c.{sort_column} IS NOT NULL"
+        rows = db.execute(valued + seek + order_by, params + seek_params + [limit, offset]).fetchall()
+        if len(rows) == limit:
+            return rows
+        # An offset past the valued segment carries over into the NULL one
+        if offset and not rows:
+            offset -= db.execute(f"SELECT COUNT(*) FROM ({valued})", params).fetchone()[0]
+        else:
+            offset = 0
+
+    null_seek, null_params = '', []
+    if after and after[0] is None:
+        null_seek, null_params = f" AND c.id {comparison} ?", [after[1]]
+    rows += db.execute(
+        f"{query} AND c.{sort_column} IS NULL{null_seek} ORDER BY c.id {direction} LIMIT ? OFFSET ?",
+        params + null_params + [limit - len(rows), offset]
+    ).fetchall()
+    return rows
+
+def build_fts_query(text):
+    """Turn free-form search input into an FTS5 prefix query.
+
+    Every word becomes a quoted prefix term ("toy"* "cam"*), so partial input
+    typed by the frontend still matches and user text can't inject FTS syntax.
+    Returns None if the input contains no searchable words.
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
 @bp.route('', methods=['GET'])
+@conditional_get
+@cached_query
 def get_cars():
     db = get_db()
     args = request.args
     
-    query = "SELECT * FROM cars WHERE 1=1"
+    try:
+        filters = parse_filters(args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    try:
+        fields = parse_fields(args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    sort = args.get('sort') or 'default'
+    explicit_sort = sort != 'default'
+    if not explicit_sort:
+        sort = DEFAULT_SORT
+    if sort not in SORT_MODES:
+        return jsonify({'success': False, 'error': f'Invalid sort: {sort}'}), 400
+    sort_column, direction = SORT_MODES[sort]
+    # The cursor needs the sort value even when the projection leaves it out
+    columns = select_list(fields, extra=(sort_column,))
+
+    query = f"SELECT {columns} FROM cars c WHERE 1=1"
     params = []
+    ranked = False
+
+    if args.get('search'):
+        match = build_fts_query(args.get('search')) if current_app.config.get('SEARCH_FTS') else None
+        if match:
+            query = (
+                f"SELECT {columns} FROM cars_fts JOIN cars c ON c.id = cars_fts.rowid "
+                "WHERE cars_fts MATCH ?"
+            )
+            params.append(match)
+            # An explicit sort overrides relevance order
+            ranked = not explicit_sort
+        else:
+            search = f"%{args.get('search')}%"
+            query += " AND (c.make LIKE ? OR c.model LIKE ?)"
+            params.extend([search, search])
 
     if args.get('make') and args.get('make') != 'all':
-        query += " AND make = ?"
+        query += " AND c.make = ?"
         params.append(args.get('make'))
-    
-    if args.get('search'):
-        search = f"%{args.get('search')}%"
-        query += " AND (make LIKE ? OR model LIKE ?)"
-        params.extend([search, search])
 
-    # Pagination
+    for predicate, value, _ in filters:
+        query += f" AND {predicate}"
+        params.append(value)
+    if not ranked:
+        index = pick_range_index(db, filters)
+        if index:
+            query = query.replace("FROM cars c", f"FROM cars c INDEXED BY {index}", 1)
+
+    # Pagination: keyset mode when a cursor is supplied, offset mode otherwise.
+    # The cursor seeks straight to (sort value, id) via the sort's index, so
+    # deep pages cost the same as the first one. Ranked search results are
+    # ordered by relevance and always page by offset.
     limit = int(args.get('limit', 20))
-    offset = int(args.get('offset', 0))
-    
-    query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-    params.extend([limit, offset])
+    cursor_token = args.get('cursor')
+
+    if ranked:
+        offset = int(args.get('offset', 0))
+        query += f" ORDER BY bm25(cars_fts, {FTS_WEIGHTS}), c.id DESC LIMIT ? OFFSET ?"
+        rows = db.execute(query, params + [limit, offset]).fetchall()
+    elif cursor_token:
+        try:
+            last_value, last_id, cursor_sort = decode_cursor(cursor_token)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if cursor_sort != sort:
+            return jsonify({'success': False, 'error': 'Cursor belongs to a different sort'}), 400
+        rows = fetch_sorted(db, query, params, sort_column, direction, limit, after=(last_value, last_id))
+    else:
+        offset = int(args.get('offset', 0))
+        rows = fetch_sorted(db, query, params, sort_column, direction, limit, offset)
 
-    cursor = db.execute(query, params)
-    cars = [car_row_to_dict(row) for row in cursor.fetchall()]
+    next_cursor = encode_cursor(rows[-1], sort) if rows and len(rows) == limit and not ranked else None
     
-    return jsonify({'success': True, 'cars': cars})
+    return cars_response(rows, fields, next_cursor=next_cursor)
+
+@bp.route('/export', methods=['GET'])
+def export_cars():
+    """Stream the whole catalog (or rows updated since a time) as NDJSON or CSV.
+
+    Replaces paging through /api/cars for bulk consumers: one cursor, constant
+    memory, gzip when the client accepts it.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'Invalid format: {fmt}'}), 400
+    try:
+        fields = parse_fields(request.args.get('fields'))
+        since = parse_since(request.args.get('updated_since'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    chunks = export_chunks(fmt, fields, since)
+    headers = {
+        'Content-Disposition': f'attachment; filename="cars.{fmt}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return current_app.response_class(
+        stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers
+    )
 
 @bp.route('/<int:id>', methods=['GET'])
+@conditional_get
 def get_car(id):
     db = get_db()
     row = db.execute("SELECT * FROM cars WHERE id = ?", (id,)).fetchone()
@@ -53,6 +295,10 @@ def get_car(id):
         return jsonify({'success': True, 'car': car_row_to_dict(row)})
     return jsonify({'success': False, 'error': 'Car not found'}), 404
 
+@bp.route('/cache/stats', methods=['GET'])
+def query_cache_stats():
+    return jsonify({'success': True, 'cache': get_query_cache().stats()})
+
 @bp.route('', methods=['POST'])
 def create_car():
     data = request.json
@@ -60,11 +306,16 @@ def create_car():
     
     # Basic validation could go here (or use Pydantic in a service layer)
     
+    # Signed-in sellers own their listing so it shows up in /api/my-listings
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user = get_user_from_token(token)
+    
     try:
         cursor = db.execute(
-            '''INSERT INTO cars (make, model, year, price, currency, description, specs)
-               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            '''INSERT INTO cars (user_id, make, model, year, price, currency, description, specs)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
             (
+                user['id'] if user else None,
                 data.get('make'),
                 data.get('model'),
                 data.get('year'),
@@ -75,6 +326,128 @@ def create_car():
             )
         )
         db.commit()
+        get_catalog_version().refresh(db)
         return jsonify({'success': True, 'id': cursor.lastrowid}), 201
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+def car_values(data):
+    """Validate one listing for POST /api/cars/bulk; return its INSERT values minus user_id.
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Listing must be an object')
+    values = []
+    for name in ('make', 'model'):
+        value = data.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'{name} is required')
+        values.append(value.strip())
+    year = data.get('year')
+    # ints only, so NaN/Infinity (floats once parsed) are rejected here too
+    if year is not None and (isinstance(year, bool) or not isinstance(year, int) or not 1886 <= year <= 2100):
+        raise ValueError(f'Invalid year: {year}')
+    price = data.get('price')
+    if price is not None and (isinstance(price, bool) or not isinstance(price, (int, float))
+                              or not math.isfinite(price) or price < 0):
+        raise ValueError(f'Invalid price: {price}')
+    currency = data.get('currency', 'AED')
+    if not isinstance(currency, str):
+        raise ValueError(f'Invalid currency: {currency}')
+    description = data.get('description')
+    if description is not None and not isinstance(description, str):
+        raise ValueError('description must be a string')
+    specs = data.get('specs', {})
+    if not isinstance(specs, dict):
+        raise ValueError('specs must be an object')
+    return values + [year, price, currency, description, json.dumps(specs)]
+
+def read_bulk_listings():
+    """Listings from a JSON array ({'cars': [...]} also accepted) or an NDJSON body.
+
+    NDJSON lines that aren't valid JSON come back as _MALFORMED_LINE so they
+    are reported against their line. Raises ValueError on a malformed JSON body
+    and OverflowError past MAX_CAR_BATCH listings.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        listings = []
+        for line in request.get_data().splitlines():
+            if not line.strip():
+                continue
+            if len(listings) == MAX_CAR_BATCH:
+                raise OverflowError
+            try:
+                listings.append(json.loads(line))
+            except ValueError:
+                listings.append(_MALFORMED_LINE)
+        return listings
+
+    data = request.get_json(silent=True)
+    listings = data.get('cars') if isinstance(data, dict) else data
+    if not isinstance(listings, list):
+        raise ValueError('Expected a JSON array of listings or an NDJSON body')
+    if len(listings) > MAX_CAR_BATCH:
+        raise OverflowError
+    return listings
+
+@bp.route('/bulk', methods=['POST'])
+def create_cars_bulk():
+    """Insert many listings in one transaction.
+
+    Every listing is validated first; valid ones are inserted together with
+    executemany and a single commit, and ``results`` lines up with the input
+    ({'id': ...} or {'id': None, 'error': ...}). With ?atomic=1 any invalid
+    listing rejects the whole batch.
+    """
+    try:
+        listings = read_bulk_listings()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except OverflowError:
+        return jsonify({'success': False, 'error': f'At most {MAX_CAR_BATCH} listings per batch'}), 413
+
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    user = get_user_from_token(token)
+    user_id = user['id'] if user else None
+
+    results = [None] * len(listings)
+    rows, positions = [], []
+    for idx, listing in enumerate(listings):
+        if listing is _MALFORMED_LINE:
+            results[idx] = {'id': None, 'error': 'Invalid JSON'}
+            continue
+        try:
+            rows.append([user_id] + car_values(listing))
+            positions.append(idx)
+        except ValueError as e:
+            results[idx] = {'id': None, 'error': str(e)}
+
+    failed = len(listings) - len(rows)
+    if failed and request.args.get('atomic') == '1':
+        for idx in positions:
+            results[idx] = {'id': None}
+        return jsonify({'success': False, 'inserted': 0, 'failed': failed, 'results': results}), 400
+
+    if rows:
+        db = get_db()
+        try:
+            # The write lock is held from here to commit, so the new rowids
+            # are consecutive and end at last_insert_rowid()
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(
+                '''INSERT INTO cars (user_id, make, model, year, price, currency, description, specs)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                rows
+            )
+            last_id = db.execute('SELECT last_insert_rowid()').fetchone()[0]
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+        get_catalog_version().refresh(db)
+        for idx, car_id in zip(positions, range(last_id - len(rows) + 1, last_id + 1)):
+            results[idx] = {'id': car_id}
+
+    status = 201 if rows else 400
+    return jsonify({'success': bool(rows), 'inserted': len(rows), 'failed': failed, 'results': results}), status
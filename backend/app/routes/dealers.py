@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify, request
 from ..db import get_db
+from ..services.catalog_version import conditional_get
 
 bp = Blueprint('dealers', __name__, url_prefix='/api/dealers')
 
 @bp.route('', methods=['GET'])
+@conditional_get
 def get_dealers():
     db = get_db()
     # Simple query for dealers
@@ -12,6 +14,7 @@ def get_dealers():
     return jsonify({'success': True, 'dealers': dealers})
 
 @bp.route('/<int:id>', methods=['GET'])
+@conditional_get
 def get_dealer(id):
     db = get_db()
     
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from ..db import get_db
 from .auth import get_user_from_token
-from .cars import car_row_to_dict
+from ..services.car_projection import parse_fields, select_list, cars_response
 
 bp = Blueprint('favorites', __name__, url_prefix='/api/favorites')
 
@@ -13,17 +13,21 @@ def get_favorites():
     if not user:
         return jsonify({'success': False, 'error': 'Authentication required'}), 401
 
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
     db = get_db()
-    cursor = db.execute('''
-        SELECT c.* 
+    cursor = db.execute(f'''
+        SELECT {select_list(fields)}
         FROM cars c
         JOIN favorites f ON c.id = f.car_id
         WHERE f.user_id = ?
         ORDER BY f.created_at DESC
     ''', (user['id'],))
     
-    cars = [car_row_to_dict(row) for row in cursor.fetchall()]
-    return jsonify({'success': True, 'cars': cars})
+    return cars_response(cursor.fetchall(), fields)
 
 @bp.route('', methods=['POST'])
 def add_favorite():
@@ -1,11 +1,22 @@
 from flask import Blueprint, jsonify, send_from_directory, current_app
+from ..services.ai_service import ai_service
 import os
 
 bp = Blueprint('system', __name__, url_prefix='/api')
 
 @bp.route('/health')
 def health_check():
-    return jsonify({'status': 'healthy', 'version': '2.0.0'})
+    # Report "not ready" while models are still warming so load balancers
+    # hold traffic until the worker can answer without a cold start
+    if current_app.config.get('MODEL_WARMUP') == 'off' or ai_service.is_ready():
+        state = ai_service.warmup_state
+        return jsonify({
+            'status': 'healthy',
+            'ready': True,
+            'version': '2.0.0',
+            'warmup': {'timings': state['timings'], 'errors': state['errors']}
+        })
+    return jsonify({'status': 'not ready', 'ready': False, 'version': '2.0.0'}), 503
 
 @bp.route('/uploads/images/<path:filename>')
 def serve_uploaded_image(filename):
@@ -1,14 +1,109 @@
 import os
 import json
+import threading
+import time
 import joblib
+import pandas as pd
 from flask import current_app
+from ..db import get_db
+from .prediction_cache import PredictionCache
+from .vector_index import VectorIndex
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+EMBEDDINGS_BASE = os.path.join(BASE_DIR, 'models', 'car_embeddings')
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+PRICE_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'fair_price_model.joblib')
+
+# Must match the schema produced by models/train_price_model.load_data
+PRICE_NUMERIC_FEATURES = ['year', 'rating', 'reviews', 'horsepower']
+PRICE_CATEGORICAL_FEATURES = ['make', 'model', 'body_style']
+PRICE_FEATURES = PRICE_NUMERIC_FEATURES + PRICE_CATEGORICAL_FEATURES
+PRICE_CURRENCY = 'AED'
+# How often (seconds) the artifact's mtime is checked for a retrained model
+PRICE_MODEL_CHECK_INTERVAL = 30
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _engine_horsepower(engines):
+    """Average powerHp over an engines payload, like the training script does."""
+    if isinstance(engines, str):
+        try:
+            engines = json.loads(engines)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(engines, list):
+        return None
+    values = []
+    for engine in engines:
+        if isinstance(engine, dict):
+            hp = _to_float(engine.get('powerHp') or engine.get('horsepower') or engine.get('power'))
+            if hp is not None:
+                values.append(hp)
+    return sum(values) / len(values) if values else None
+
+
+def price_features(listing):
+    """Normalize a listing payload into the feature tuple the price model expects.
+
+    Returns (year, rating, reviews, horsepower, make, model, body_style) with
+    None for unknown numeric values, or raises ValueError if make, model or
+    year is missing.
+    """
+    specs = listing.get('specs') or {}
+    if isinstance(specs, str):
+        try:
+            specs = json.loads(specs)
+        except json.JSONDecodeError:
+            specs = {}
+    if not isinstance(specs, dict):
+        specs = {}
+
+    make = str(listing.get('make') or '').strip()
+    model = str(listing.get('model') or '').strip()
+    year = _to_float(listing.get('year'))
+    if not make or not model or year is None:
+        raise ValueError('make, model and year are required')
+
+    horsepower = _to_float(listing.get('horsepower') or specs.get('horsepower'))
+    if horsepower is None:
+        horsepower = _engine_horsepower(listing.get('engines'))
+    body_style = (
+        listing.get('bodyStyle') or listing.get('body_style') or specs.get('bodyStyle') or 'Unknown'
+    )
+    return (
+        year,
+        _to_float(listing.get('rating')),
+        _to_float(listing.get('reviews')),
+        horsepower,
+        make,
+        model,
+        str(body_style).strip(),
+    )
+
 
 class AIService:
     _instance = None
     
     def __init__(self):
         self.price_model = None
+        self.price_metadata = {}
+        self.price_defaults = {}
+        self._price_model_mtime = None
+        self._price_checked_at = 0.0
+        self.price_cache = PredictionCache(
+            maxsize=int(os.environ.get('PRICE_CACHE_SIZE', 10000)),
+            ttl=float(os.environ.get('PRICE_CACHE_TTL', 3600)),
+        )
         self.embeddings = None
+        self.encoder = None
+        self._warmup_lock = threading.Lock()
+        self.warmup_state = {'status': 'pending', 'pid': None, 'timings': {}, 'errors': []}
         
     @classmethod
     def get_instance(cls):
@@ -17,28 +112,171 @@ class AIService:
         return cls._instance
 
     def load_models(self):
-        # Lazy load models
-        if self.price_model:
+        # Lazy load models. Once loaded, the artifact is re-checked at most every
+        # PRICE_MODEL_CHECK_INTERVAL seconds so a retrained model gets picked up.
+        now = time.monotonic()
+        if self.price_model and now - self._price_checked_at < PRICE_MODEL_CHECK_INTERVAL:
             return
+        self._price_checked_at = now
 
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-        model_path = os.path.join(base_dir, 'models', 'fair_price_model.joblib')
-        
-        if os.path.exists(model_path):
+        try:
+            mtime = os.path.getmtime(PRICE_MODEL_PATH)
+        except OSError:
+            return
+        if self.price_model and mtime == self._price_model_mtime:
+            return
+
+        try:
+            artifact = joblib.load(PRICE_MODEL_PATH)
+            if isinstance(artifact, dict):
+                pipeline = artifact['pipeline']
+                metadata = artifact.get('metadata') or {}
+            else:
+                pipeline, metadata = artifact, {}
+            self.price_defaults = self._price_defaults(pipeline)
+            self.price_metadata = metadata
+            self.price_model = pipeline
+            self._price_model_mtime = mtime
+            # Cached estimates belong to the previous model
+            self.price_cache.set_version(metadata.get('trained_at') or mtime)
+            print("Loaded price model")
+        except Exception as e:
+            print(f"Failed to load price model: {e}")
+
+    @staticmethod
+    def _price_defaults(pipeline):
+        # Missing numeric inputs fall back to the training means held by the
+        # fitted StandardScaler, so they land at zero after scaling
+        try:
+            scaler = pipeline.named_steps['preprocess'].named_transformers_['num']
+            return dict(zip(PRICE_NUMERIC_FEATURES, (float(m) for m in scaler.mean_)))
+        except (AttributeError, KeyError):
+            return {'rating': 0.0, 'reviews': 0.0, 'horsepower': 0.0}
+
+    def load_embeddings(self):
+        # Lazy load the vector index and the query encoder
+        if self.embeddings is not None:
+            return
+
+        try:
+            self.embeddings = VectorIndex.load(EMBEDDINGS_BASE)
+        except Exception as e:
+            print(f"Failed to load embeddings: {e}")
+            self.embeddings = None
+        if self.embeddings is None:
+            return
+        print(f"Loaded {len(self.embeddings)} car embeddings")
+
+        try:
+            from sentence_transformers import SentenceTransformer
+            self.encoder = SentenceTransformer(self.embeddings.model_name or EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Failed to load embedding model: {e}")
+            self.encoder = None
+
+    def estimate_prices(self, feature_rows):
+        """Score many feature tuples (see price_features).
+
+        Rows already in the prediction cache are answered from it; the rest
+        go through the pipeline in a single predict call.
+        """
+        self.load_models()
+        if not self.price_model:
+            return None
+
+        results = [None] * len(feature_rows)
+        missing = []
+        for idx, row in enumerate(feature_rows):
+            cached = self.price_cache.get(row)
+            if cached is None:
+                missing.append(idx)
+            else:
+                results[idx] = cached
+        if not missing:
+            return results
+
+        predictions = self._predict([feature_rows[idx] for idx in missing])
+        for idx, value in zip(missing, predictions):
+            price = round(max(float(value), 0.0), 2)
+            results[idx] = price
+            self.price_cache.put(feature_rows[idx], price)
+        return results
+
+    def _predict(self, feature_rows):
+        frame = pd.DataFrame.from_records(feature_rows, columns=PRICE_FEATURES)
+        for column, default in self.price_defaults.items():
+            frame[column] = frame[column].fillna(default)
+        return self.price_model.predict(frame)
+
+    def estimate_price(self, listing):
+        estimates = self.estimate_prices([price_features(listing)])
+        return estimates[0] if estimates is not None else None
+
+    def price_range(self, estimate):
+        mae = (self.price_metadata.get('metrics') or {}).get('mae')
+        if estimate is None or not mae:
+            return None
+        return {'low': round(max(estimate - mae, 0.0), 2), 'high': round(estimate + mae, 2)}
+
+    def start_warm_up(self, background=True):
+        """Kick off warm_up once per process.
+
+        A worker forked from a preloaded master gets a fresh warm-up unless
+        the master had already finished, in which case the loaded models are
+        inherited as-is.
+        """
+        with self._warmup_lock:
+            state = self.warmup_state
+            if state['status'] == 'ready':
+                return
+            if state['status'] == 'running' and state['pid'] == os.getpid():
+                return
+            self.warmup_state = {'status': 'running', 'pid': os.getpid(), 'timings': {}, 'errors': []}
+
+        if background:
+            threading.Thread(target=self.warm_up, name='model-warmup', daemon=True).start()
+        else:
+            self.warm_up()
+
+    def warm_up(self):
+        """Load the price model and embedding index and exercise them once.
+
+        Timings (ms) and failures are recorded in warmup_state; the status
+        becomes 'ready' even if a model is missing so the worker still serves
+        the endpoints that don't need it.
+        """
+        state = self.warmup_state
+        timings, errors = state['timings'], state['errors']
+
+        def timed(name, fn):
+            started = time.perf_counter()
             try:
-                self.price_model = joblib.load(model_path)
-                print("Loaded price model")
+                fn()
             except Exception as e:
-                print(f"Failed to load price model: {e}")
+                errors.append(f"{name}: {e}")
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
 
-    def estimate_price(self, make, model, year, specs):
-        self.load_models()
-        # if not self.price_model:
-        #     return None
-            
-        # Simplified prediction logic wrapper
-        # In a real refactor, we'd move the dataframe construction here
-        return 50000 # Mock return for structure demonstration
+        timed('price_model_load', self.load_models)
+        if self.price_model:
+            dummy = price_features({'make': 'Toyota', 'model': 'Camry', 'year': 2020})
+            timed('price_model_predict', lambda: self._predict([dummy]))
+        else:
+            errors.append('price_model: not available')
+
+        timed('embeddings_load', self.load_embeddings)
+        if self.embeddings is not None and self.encoder is not None:
+            def search():
+                vector = self.encoder.encode(['warm up'], normalize_embeddings=True)[0]
+                self.embeddings.search(vector, 1)
+            timed('semantic_search', search)
+        else:
+            errors.append('embeddings: not available')
+
+        state['status'] = 'ready'
+        print(f"Model warm-up finished: {timings}")
+
+    def is_ready(self):
+        return self.warmup_state['status'] == 'ready'
 
     def chat(self, message, history, image_base64=None):
         # Gemini integration logic
@@ -57,34 +295,30 @@ class AIService:
         return "I am the IntelliWheels AI Assistant. I can help you find cars, estimate prices, or create listings."
 
     def semantic_search(self, query, limit):
-        # Mock implementation
+        if not query:
+            return []
+        self.load_embeddings()
+        if self.embeddings is None or self.encoder is None:
+            return []
+
+        query_vector = self.encoder.encode([query], normalize_embeddings=True)[0]
+        hits = self.embeddings.search(query_vector, limit)
+        if not hits:
+            return []
+
+        # Hydrate all matches in one round trip, then restore ranking order
+        from ..routes.cars import car_row_to_dict
+        ids = [car_id for car_id, _ in hits]
+        placeholders = ",".join("?" for _ in ids)
+        rows = get_db().execute(
+            f"SELECT * FROM cars WHERE id IN ({placeholders})", ids
+        ).fetchall()
+        cars_by_id = {row['id']: car_row_to_dict(row) for row in rows}
+
         return [
-            {
-                "car": {
-                    "id": 101,
-                    "make": "Toyota",
-                    "model": "Camry",
-                    "year": 2023,
-                    "price": 85000,
-                    "currency": "AED",
-                    "image": None,
-                    "description": "A great car matching your search for " + query
-                },
-                "similarity": 0.95
-            },
-            {
-                "car": {
-                    "id": 102,
-                    "make": "Honda",
-                    "model": "Accord",
-                    "year": 2022,
-                    "price": 78000,
-                    "currency": "AED",
-                    "image": None,
-                    "description": "Another option for " + query
-                },
-                "similarity": 0.92
-            }
+            {"car": cars_by_id[car_id], "similarity": score, "score": score}
+            for car_id, score in hits
+            if car_id in cars_by_id
         ]
 
     def analyze_image(self, image_base64):
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+# Catalog prices are ingested in AED (see ingest_excel_to_db.py)
+ANALYTICS_CURRENCY = 'AED'
+PRICE_BUCKET_LABELS = {0: '< 10k', 1: '10k-30k', 2: '30k-60k', 3: '> 60k'}
+TOP_MAKES = 5
+GROWTH_MONTHS = 6
+WATCHLIST_SIZE = 5
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def get_insights(db):
+    """Build the dashboard insights from the materialized analytics tables.
+
+    Every query here reads either a small aggregate table or a single index
+    endpoint, so the cost does not grow with the size of the catalog.
+    """
+    totals = db.execute('''
+        SELECT COALESCE(SUM(listings), 0) AS listings,
+               COALESCE(SUM(priced), 0) AS priced,
+               COALESCE(SUM(price_sum), 0) AS price_sum
+        FROM analytics_make_stats
+    ''').fetchone()
+    # Separate statements so each MIN/MAX is answered from idx_cars_price
+    min_price = db.execute('SELECT MIN(price) FROM cars WHERE price > 0').fetchone()[0]
+    max_price = db.execute('SELECT MAX(price) FROM cars WHERE price > 0').fetchone()[0]
+    favorites_count = db.execute(
+        'SELECT COALESCE(SUM(favorites), 0) FROM analytics_car_favorites'
+    ).fetchone()[0]
+
+    summary = {
+        'currency': ANALYTICS_CURRENCY,
+        'average_price': _round(totals['price_sum'] / totals['priced']) if totals['priced'] else None,
+        'min_price': _round(min_price),
+        'max_price': _round(max_price),
+        'total_listings': totals['listings'],
+        'favorites_count': favorites_count,
+    }
+
+    top_makes = [
+        {
+            'make': row['make'],
+            'avg_price': _round(row['price_sum'] / row['priced']) if row['priced'] else None,
+            'listings': row['listings'],
+        }
+        for row in db.execute(
+            'SELECT make, listings, priced, price_sum FROM analytics_make_stats '
+            'ORDER BY listings DESC, make ASC LIMIT ?',
+            (TOP_MAKES,)
+        )
+    ]
+
+    bucket_counts = {
+        row['bucket']: row['listings']
+        for row in db.execute('SELECT bucket, listings FROM analytics_price_buckets')
+    }
+    price_distribution = [
+        {'bucket': label, 'count': bucket_counts.get(bucket, 0)}
+        for bucket, label in PRICE_BUCKET_LABELS.items()
+    ]
+
+    # Cumulative listing count at the end of each of the last few months
+    months = db.execute(
+        "SELECT month, listings FROM analytics_monthly_listings "
+        "WHERE month != 'unknown' ORDER BY month ASC"
+    ).fetchall()
+    running, growth = 0, []
+    for row in months:
+        running += row['listings']
+        label = datetime.strptime(row['month'], '%Y-%m').strftime('%b')
+        growth.append({'label': label, 'value': running})
+
+    watchlist = [
+        {
+            'id': row['id'],
+            'make': row['make'],
+            'model': row['model'],
+            'price': row['price'],
+            'currency': row['currency'],
+            'favorites': row['favorites'],
+        }
+        for row in db.execute('''
+            SELECT c.id, c.make, c.model, c.price, c.currency, f.favorites
+            FROM analytics_car_favorites f
+            JOIN cars c ON c.id = f.car_id
+            ORDER BY f.favorites DESC
+            LIMIT ?
+        ''', (WATCHLIST_SIZE,))
+    ]
+
+    return {
+        'summary': summary,
+        'market_top_makes': top_makes,
+        'price_distribution': price_distribution,
+        'growth_trends': growth[-GROWTH_MONTHS:],
+        'watchlist': watchlist,
+    }
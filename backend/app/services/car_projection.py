@@ -0,0 +1,83 @@
+from flask import current_app
+
+# Columns a list response may project, in output order
+CAR_FIELDS = (
+    'id', 'user_id', 'make', 'model', 'year', 'price', 'currency', 'description',
+    'image_url', 'image_urls', 'gallery_images', 'media_gallery', 'video_url',
+    'rating', 'reviews', 'specs', 'engines', 'statistics', 'source_sheets',
+    'latitude', 'longitude', 'body_style', 'max_hp', 'min_fuel_l_100km',
+    'created_at', 'updated_at',
+)
+# Stored as JSON text and returned as nested JSON rather than strings
+JSON_FIELDS = frozenset(('specs', 'engines', 'statistics', 'gallery_images', 'media_gallery'))
+# fields=summary: what a listing card needs
+SUMMARY_FIELDS = (
+    'id', 'make', 'model', 'year', 'price', 'currency', 'rating', 'reviews',
+    'image_url', 'body_style', 'max_hp', 'specs', 'created_at',
+)
+
+
+def parse_fields(raw):
+    """Resolve a ``fields=`` parameter to a tuple of columns.
+
+    Accepts "summary", a comma-separated list of CAR_FIELDS, or nothing (every
+    field). id is always included. Raises ValueError on an unknown field.
+    """
+    if not raw:
+        return CAR_FIELDS
+    if raw == 'summary':
+        return SUMMARY_FIELDS
+    requested = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in CAR_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # Keep the canonical order so equal projections produce equal output
+    wanted = set(requested) | {'id'}
+    return tuple(name for name in CAR_FIELDS if name in wanted)
+
+
+def select_list(fields, alias='c', extra=()):
+    """SELECT column list for ``fields`` plus any ``extra`` columns needed internally.
+
+    JSON columns come back as their raw text, or NULL when malformed, so the
+    renderer can splice them in without a decode/encode round trip.
+    """
+    columns = []
+    for name in fields:
+        if name in JSON_FIELDS:
+            columns.append(f'CASE WHEN json_valid({alias}.{name}) THEN {alias}.{name} END AS {name}')
+        else:
+            columns.append(f'{alias}.{name}')
+    columns.extend(f'{alias}.{name}' for name in extra if name not in fields)
+    return ', '.join(columns)
+
+
+def row_renderer(fields):
+    """Return a function serializing one row to a JSON object, JSON columns spliced in verbatim."""
+    scalars = [name for name in fields if name not in JSON_FIELDS]
+    raw = [name for name in fields if name in JSON_FIELDS]
+    dumps = current_app.json.dumps
+
+    def render(row):
+        text = dumps({name: row[name] for name in scalars})
+        if raw:
+            spliced = ''.join(f',"{name}":{row[name] or "null"}' for name in raw)
+            text = text[:-1] + spliced + '}' if scalars else '{' + spliced[1:] + '}'
+        return text
+    return render
+
+
+def render_cars(rows, fields):
+    """Serialize rows to a JSON array of row_renderer objects."""
+    render = row_renderer(fields)
+    return '[' + ','.join(render(row) for row in rows) + ']'
+
+
+def cars_response(rows, fields, **extra):
+    """A {'success': true, 'cars': [...], **extra} response built around render_cars."""
+    dumps = current_app.json.dumps
+    body = ['{"success":true,"cars":', render_cars(rows, fields)]
+    for key, value in extra.items():
+        body.append(f',{dumps(key)}:{dumps(value)}')
+    body.append('}')
+    return current_app.response_class(''.join(body), mimetype='application/json')
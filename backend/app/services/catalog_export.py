@@ -0,0 +1,102 @@
+import csv
+import io
+import zlib
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from ..db import connect, pragmas_from_config
+from .car_projection import row_renderer, select_list
+
+# format= value -> mimetype
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# Rows fetched from the cursor and written per chunk
+EXPORT_BATCH_SIZE = 1000
+GZIP_LEVEL = 6
+
+
+def parse_since(raw):
+    """Normalize an ``updated_since`` ISO 8601 date/time to SQLite's UTC timestamp format.
+
+    Naive values are taken as UTC, like the CURRENT_TIMESTAMP values they are
+    compared with. Returns None for an empty value; raises ValueError when
+    malformed.
+    """
+    if not raw:
+        return None
+    try:
+        since = datetime.fromisoformat(raw.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid updated_since: {raw}')
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def export_batches(fields, since=None):
+    """Yield lists of rows for the whole catalog from one cursor.
+
+    Uses its own connection rather than the request's pooled one, since an
+    export can run for minutes. Full exports walk the table in id order;
+    incremental ones walk idx_cars_updated_at_id. ``>=`` rather than ``>``
+    because updated_at has one-second resolution: a client passing back the
+    last updated_at it saw gets that second's rows again instead of missing
+    rows written later in the same second.
+    """
+    conn = connect(current_app.config['DATABASE'], pragmas_from_config(current_app.config))
+    try:
+        if since:
+            cursor = conn.execute(
+                f'SELECT {select_list(fields)} FROM cars c WHERE c.updated_at >= ? '
+                'ORDER BY c.updated_at, c.id',
+                (since,)
+            )
+        else:
+            cursor = conn.execute(f'SELECT {select_list(fields)} FROM cars c ORDER BY c.id')
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def ndjson_chunks(batches, fields):
+    """One JSON object per line, encoded like GET /api/cars list items."""
+    render = row_renderer(fields)
+    for rows in batches:
+        yield ''.join(render(row) + '\n' for row in rows).encode('utf-8')
+
+
+def csv_chunks(batches, fields):
+    """Header row then one row per car; JSON columns hold their raw JSON text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(fields)
+    yield buffer.getvalue().encode('utf-8')
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """Compress a chunk stream incrementally into a single gzip member."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(fmt, fields, since=None):
+    batches = export_batches(fields, since)
+    if fmt == 'csv':
+        return csv_chunks(batches, fields)
+    return ndjson_chunks(batches, fields)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import weakref
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request
+
+from ..db import connect
+
+
+# Every CatalogVersion in this process; their locks are replaced in a forked
+# child, where a copy held by the parent's poller would never be released
+_instances = weakref.WeakSet()
+
+
+def _after_fork():
+    for instance in _instances:
+        instance._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class CatalogVersion:
+    """In-process copy of the catalog_version counter.
+
+    Triggers bump the counter in SQLite on every write to cars or dealers,
+    whichever process makes it. Each worker polls it from a daemon thread
+    every ``poll_interval`` seconds, so request handlers can build ETags
+    without running SQL; writes made through this worker refresh it
+    immediately. With ``poll_interval`` 0 the counter is read per request.
+    The counter only grows, so the in-process copy never moves backwards: a
+    slow poll can't undo a newer value a write just refreshed.
+    """
+
+    def __init__(self, db_path, poll_interval=1.0):
+        self.db_path = db_path
+        self.poll_interval = poll_interval
+        self.value = None
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        _instances.add(self)
+
+    def read(self, db):
+        try:
+            row = db.execute('SELECT version FROM catalog_version WHERE id = 1').fetchone()
+        except sqlite3.OperationalError:
+            # Schema not migrated yet; ETags still work, just never change
+            return 0
+        return row[0] if row else 0
+
+    def refresh(self, db):
+        """Re-read the counter on ``db``; call after committing a catalog write."""
+        value = self.read(db)
+        with self._lock:
+            if self.value is None or value > self.value:
+                self.value = value
+            return self.value
+
+    def close(self):
+        """Stop the poller thread (tests and scripts that build many apps)."""
+        self._closed.set()
+
+    def current(self):
+        if self.poll_interval <= 0:
+            conn = connect(self.db_path)
+            try:
+                return self.refresh(conn)
+            finally:
+                conn.close()
+        if self._pid != os.getpid():
+            self._start()
+        return self.value
+
+    def _start(self):
+        # Also runs after a fork: the parent's poller thread doesn't survive it
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            conn = connect(self.db_path)
+            try:
+                value = self.read(conn)
+            finally:
+                conn.close()
+            if self.value is None or value > self.value:
+                self.value = value
+            self._thread = threading.Thread(target=self._poll, name='catalog-version', daemon=True)
+            self._thread.start()
+
+    def _poll(self):
+        pid = os.getpid()
+        while self._pid == pid and not self._closed.wait(self.poll_interval):
+            if not os.path.exists(self.db_path):
+                # The database was removed (a test or benchmark's scratch copy)
+                return
+            try:
+                conn = connect(self.db_path)
+                try:
+                    self.refresh(conn)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Catalog version poll failed: {e}")
+
+
+def get_catalog_version():
+    return current_app.extensions['catalog_version']
+
+
+def request_key():
+    """The current request's path + query with parameters sorted, so ?a=1&b=2 == ?b=2&a=1.
+
+    Parameters are re-encoded, so a value holding an encoded & or = can't
+    pass for extra parameters (?make=BMW%26search%3DX5 vs ?make=BMW&search=X5).
+    """
+    return f'{request.path}?{urlencode(sorted(request.args.items(multi=True)))}'
+
+
+def catalog_etag():
+    """Strong ETag for the current request: catalog version + request_key()."""
+    key = f'{get_catalog_version().current()}:{request_key()}'
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def _cache_headers(response):
+    config = current_app.config
+    response.cache_control.public = True
+    response.cache_control.max_age = config['CATALOG_MAX_AGE']
+    response.cache_control.s_maxage = config['CATALOG_CDN_MAX_AGE']
+    return response
+
+
+def conditional_get(view):
+    """Serve a public catalog read with an ETag, answering If-None-Match with 304.
+
+    The 304 path only compares against the in-memory catalog version, so it
+    never opens a database connection.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = catalog_etag()
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return _cache_headers(response)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            _cache_headers(response)
+        return response
+    return wrapper
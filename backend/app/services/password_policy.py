@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt'
+
+
+class HasherBusy(Exception):
+    """Raised when the verification pool already has its maximum backlog."""
+
+
+class PasswordHasher:
+    """Hashing policy: one algorithm/cost for new hashes, rehash on login.
+
+    ``method`` is any werkzeug method string, e.g. ``scrypt:32768:8:1`` or
+    ``pbkdf2:sha256:600000``. Stored hashes whose method prefix differs from
+    the policy are reported by ``needs_rehash`` so login can upgrade them.
+
+    With ``workers > 0``, hashing runs in a bounded thread pool (hashlib
+    releases the GIL), capping how many CPU-heavy hashes run at once; beyond
+    ``max_pending`` queued jobs callers get HasherBusy instead of piling up.
+    """
+
+    def __init__(self, method=None, workers=0, max_pending=64):
+        self.method = method or DEFAULT_METHOD
+        # werkzeug expands defaults ("scrypt" -> "scrypt:32768:8:1"); compare against that
+        self.canonical_method = generate_password_hash('', method=self.method).split('$', 1)[0]
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash') if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(workers + max_pending) if workers > 0 else None
+
+    def _run(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Password hashing queue is full')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != self.canonical_method
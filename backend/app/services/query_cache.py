@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app
+
+from ..db import connect
+from .catalog_version import get_catalog_version, request_key
+
+_SHARED_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'OFF', 'busy_timeout': 1000}
+
+
+class QueryCache:
+    """Two-tier cache of rendered catalog responses.
+
+    Entries are keyed by the normalized request (path + sorted query) and
+    tagged with the catalog version they were built at, so any write to cars
+    or dealers (API, bulk or ingest; see CatalogVersion) makes them
+    unreachable. The first tier is a per-worker LRU bounded by total body
+    bytes; the optional second tier is a SQLite file every worker on the
+    host shares, so one worker's miss warms the others.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, shared_path=None, shared_max_entries=10000):
+        self.max_bytes = max_bytes
+        self.shared_path = shared_path
+        self.shared_max_entries = shared_max_entries
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shared_pruned_version = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.shared_errors = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                # Everything cached belongs to an older catalog
+                self._data.clear()
+                self._bytes = 0
+                self._version = version
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return body
+
+        body = self._shared_get(key, version)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._put_local(key, version, body)
+        return body
+
+    def put(self, key, version, body):
+        with self._lock:
+            self.stores += 1
+        self._put_local(key, version, body)
+        self._shared_put(key, version, body)
+
+    def _put_local(self, key, version, body):
+        # One entry may not take more than an eighth of the budget
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._data[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _shared_conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.shared_path, _SHARED_PRAGMAS)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS query_cache (
+                    key TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_query_cache_stored_at ON query_cache (stored_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _shared_get(self, key, version):
+        if not self.shared_path:
+            return None
+        try:
+            row = self._shared_conn().execute(
+                'SELECT body FROM query_cache WHERE key = ? AND version = ?', (key, version)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._shared_failed(e)
+            return None
+        return bytes(row[0]) if row else None
+
+    def _shared_put(self, key, version, body):
+        if not self.shared_path:
+            return
+        try:
+            conn = self._shared_conn()
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO query_cache (key, version, body, stored_at) VALUES (?, ?, ?, ?)',
+                    (key, version, body, time.time())
+                )
+                if self._shared_pruned_version != version:
+                    self._shared_pruned_version = version
+                    conn.execute('DELETE FROM query_cache WHERE version != ?', (version,))
+                # Every worker adds entries, so the bound is checked on each
+                # put; the overflow is the oldest few rows of the stored_at index
+                excess = conn.execute('SELECT COUNT(*) FROM query_cache').fetchone()[0] - self.shared_max_entries
+                if excess > 0:
+                    conn.execute('''
+                        DELETE FROM query_cache WHERE key IN (
+                            SELECT key FROM query_cache ORDER BY stored_at LIMIT ?
+                        )
+                    ''', (excess,))
+        except sqlite3.Error as e:
+            self._shared_failed(e)
+
+    def _shared_failed(self, error):
+        # The shared tier is an optimization; never fail a request over it
+        with self._lock:
+            self.shared_errors += 1
+        print(f"Shared query cache error: {error}")
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'catalog_version': self._version,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'shared_enabled': bool(self.shared_path),
+                'shared_errors': self.shared_errors,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def get_query_cache():
+    return current_app.extensions['query_cache']
+
+
+def cached_query(view):
+    """Serve a public catalog read from the QueryCache, filling it on a miss."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_query_cache()
+        if not cache.enabled:
+            return view(*args, **kwargs)
+
+        key = request_key()
+        version = get_catalog_version().current()
+        body = cache.get(key, version)
+        if body is not None:
+            return current_app.response_class(body, mimetype='application/json')
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and response.mimetype == 'application/json':
+            cache.put(key, version, response.get_data())
+        return response
+    return wrapper
@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+
+def hash_token(token):
+    """Cache keys and revocations use a digest, never the raw token."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def _expiry_timestamp(expires_at):
+    # user_sessions.expires_at is stored as a naive UTC datetime string
+    if not expires_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(expires_at))
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SessionCache:
+    """Bounded in-process TTL cache of token hash -> user dict.
+
+    Entries never outlive the session's own expires_at. When ``shared`` is
+    on, logouts are also written to the session_revocations table and every
+    worker polls it (at most once per ``poll_interval`` seconds) so a token
+    revoked on one worker stops working on all of them. Rows with a user_id,
+    written by triggers when a user's role or account changes, drop all of
+    that user's tokens.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60, shared=True, poll_interval=1.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_revocation_id = None
+        self._polled_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, token_hash):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(token_hash)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[token_hash]
+                self.misses += 1
+                return None
+            self._data.move_to_end(token_hash)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token_hash, user, expires_at=None):
+        if not self.enabled:
+            return
+        deadline = time.time() + self.ttl
+        session_deadline = _expiry_timestamp(expires_at)
+        if session_deadline is not None:
+            deadline = min(deadline, session_deadline)
+        with self._lock:
+            self._data[token_hash] = (user, deadline)
+            self._data.move_to_end(token_hash)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, token_hash):
+        with self._lock:
+            self._data.pop(token_hash, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token_hash in [key for key, (user, _) in self._data.items() if user['id'] == user_id]:
+                del self._data[token_hash]
+
+    def record_revocation(self, db, token_hash):
+        """Publish a logout to other workers through the shared table."""
+        self.invalidate(token_hash)
+        if not self.shared:
+            return
+        db.execute('INSERT INTO session_revocations (token_hash) VALUES (?)', (token_hash,))
+        # Older revocations can't match anything still cached anywhere
+        db.execute(
+            "DELETE FROM session_revocations WHERE revoked_at < datetime('now', ?)",
+            (f'-{int(self.ttl) + 60} seconds',)
+        )
+
+    def sync_revocations(self, db):
+        """Evict tokens revoked by other workers since the last poll."""
+        if not (self.shared and self.enabled):
+            return
+        now = time.monotonic()
+        if now - self._polled_at < self.poll_interval:
+            return
+        self._polled_at = now
+
+        if self._last_revocation_id is None:
+            # Nothing cached predates this worker, so start from the current tail
+            row = db.execute('SELECT COALESCE(MAX(id), 0) FROM session_revocations').fetchone()
+            self._last_revocation_id = row[0]
+            return
+        rows = db.execute(
+            'SELECT id, token_hash, user_id FROM session_revocations WHERE id > ? ORDER BY id',
+            (self._last_revocation_id,)
+        ).fetchall()
+        for row in rows:
+            if row[2] is not None:
+                self.invalidate_user(row[2])
+            else:
+                self.invalidate(row[1])
+            self._last_revocation_id = row[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import click
+from flask.cli import with_appcontext
+
+from ..db import get_db
+
+
+class SessionReaper:
+    """Deletes expired user_sessions rows in bounded batches.
+
+    Each batch is its own short transaction, so the reaper never holds the
+    write lock long enough to stall logins. Runs either from the
+    ``flask reap-sessions`` command or as a daemon thread per worker.
+    """
+
+    def __init__(self, batch_size=1000, interval=3600):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.total_reaped = 0
+        self.last_reaped = 0
+        self.last_run_at = None
+        self.last_table_size = None
+
+    def reap(self, db, max_batches=None):
+        """Delete expired sessions; returns how many rows were removed."""
+        reaped = batches = 0
+        while max_batches is None or batches < max_batches:
+            cursor = db.execute('''
+                DELETE FROM user_sessions WHERE rowid IN (
+                    SELECT rowid FROM user_sessions
+                    WHERE expires_at <= CURRENT_TIMESTAMP
+                    LIMIT ?
+                )
+            ''', (self.batch_size,))
+            db.commit()
+            reaped += cursor.rowcount
+            batches += 1
+            if cursor.rowcount < self.batch_size:
+                break
+
+        table_size = db.execute('SELECT COUNT(*) FROM user_sessions').fetchone()[0]
+        with self._lock:
+            self.runs += 1
+            self.total_reaped += reaped
+            self.last_reaped = reaped
+            self.last_run_at = datetime.now(timezone.utc).isoformat()
+            self.last_table_size = table_size
+        return reaped
+
+    def start(self, db_path):
+        """Run reap() every ``interval`` seconds on a daemon thread.
+
+        One thread per process: threads don't survive fork, so a worker forked
+        from a preloaded master calls this again (gunicorn.conf.py post_fork)
+        to get its own.
+        """
+        if self.interval <= 0:
+            return
+
+        def loop():
+            while True:
+                try:
+                    conn = sqlite3.connect(db_path)
+                    try:
+                        reaped = self.reap(conn)
+                    finally:
+                        conn.close()
+                    if reaped:
+                        print(f"Reaped {reaped} expired sessions")
+                except sqlite3.Error as e:
+                    print(f"Session reaper failed: {e}")
+                time.sleep(self.interval)
+
+        if self._pid != os.getpid():
+            # The parent's thread may have held the lock at fork time; the
+            # copy would then never be released in this process
+            self._lock = threading.Lock()
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=loop, name='session-reaper', daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'total_reaped': self.total_reaped,
+                'last_reaped': self.last_reaped,
+                'last_run_at': self.last_run_at,
+                'table_size': self.last_table_size,
+            }
+
+
+session_reaper = SessionReaper()
+
+
+@click.command('reap-sessions')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+@with_appcontext
+def reap_sessions_command(max_batches):
+    """Delete expired sessions in bounded batches."""
+    reaped = session_reaper.reap(get_db(), max_batches=max_batches)
+    click.echo(f'Reaped {reaped} expired sessions; {session_reaper.last_table_size} remain.')
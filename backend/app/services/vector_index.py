@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def store_paths(base):
+    """Return the (matrix, ids, metadata) file paths for a store base path."""
+    return base + '.npy', base + '.ids.npy', base + '.meta.json'
+
+
+def store_checksum(car_ids, matrix):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(car_ids, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+    return f"sha256:{digest.hexdigest()}"
+
+
+class VectorIndex:
+    """In-process exact nearest-neighbour index over normalized car embeddings.
+
+    All vectors live in one contiguous float32 matrix, so a query is a single
+    matrix-vector product followed by an argpartition for the top-k.
+    """
+
+    def __init__(self, car_ids, matrix, model_name=None):
+        self.car_ids = np.ascontiguousarray(car_ids, dtype=np.int64)
+        # A float32 memmap is already contiguous, so this keeps it mapped
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.model_name = model_name
+        if self.matrix.ndim != 2 or len(self.car_ids) != self.matrix.shape[0]:
+            raise ValueError("Embedding matrix and car id array do not line up")
+
+    def __len__(self):
+        return len(self.car_ids)
+
+    @property
+    def dimension(self):
+        return self.matrix.shape[1]
+
+    @classmethod
+    def from_json(cls, path):
+        """Load the car_embeddings.json payload written by build_embeddings.py."""
+        with open(path, 'r', encoding='utf-8') as fh:
+            payload = json.load(fh)
+        if not payload:
+            return cls(np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32))
+
+        dim = len(payload[0]['embedding'])
+        car_ids = np.empty(len(payload), dtype=np.int64)
+        matrix = np.empty((len(payload), dim), dtype=np.float32)
+        for idx, item in enumerate(payload):
+            car_ids[idx] = item['car_id']
+            matrix[idx] = item['embedding']
+        return cls(car_ids, matrix)
+
+    @classmethod
+    def from_store(cls, base, verify=False):
+        """Open the binary store written by build_embeddings.py.
+
+        The matrix is memory-mapped read-only, so every worker process on a
+        host shares one page-cache copy instead of holding its own.
+        """
+        matrix_path, ids_path, meta_path = store_paths(base)
+        with open(meta_path, 'r', encoding='utf-8') as fh:
+            metadata = json.load(fh)
+
+        matrix = np.load(matrix_path, mmap_mode='r')
+        car_ids = np.load(ids_path)
+        if matrix.dtype != np.float32 or matrix.shape != (metadata['count'], metadata['dimension']):
+            raise ValueError(f"Embedding store at {base} does not match its metadata")
+        if verify and store_checksum(car_ids, matrix) != metadata.get('checksum'):
+            raise ValueError(f"Embedding store at {base} failed checksum verification")
+        return cls(car_ids, matrix, model_name=metadata.get('model'))
+
+    @classmethod
+    def load(cls, base, verify=False):
+        """Load the binary store at base, falling back to the legacy base.json."""
+        if os.path.exists(store_paths(base)[2]):
+            return cls.from_store(base, verify=verify)
+        if os.path.exists(base + '.json'):
+            return cls.from_json(base + '.json')
+        return None
+
+    def search(self, query_vector, k):
+        """Return [(car_id, score), ...] for the k most similar vectors, best first.
+
+        Vectors are L2-normalized at build time, so the dot product is the
+        cosine similarity.
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        scores = self.matrix @ query
+
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(self.car_ids[i]), float(scores[i])) for i in top]
@@ -0,0 +1,167 @@
+"""Dashboard insights: on-demand GROUP BY queries vs the materialized aggregates.
+
+Seeds a scratch database with --cars listings spread over two years and
+--favorites favorites, then times one /api/analytics/insights computation
+both ways and checks they agree. Also reports what the analytics triggers
+add to each insert.
+
+    python benchmark_analytics.py --cars 1000000 --favorites 50000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+TRIGGER_SAMPLE = 20000
+
+
+def car_rows(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        price = None if i % 25 == 0 else rng.randint(5000, 400000)
+        created = start + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+        yield (f'Make{i % 60}', f'Model{i % 400}', 2005 + i % 20, price, 'AED',
+               created.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+INSERT_CAR = 'INSERT INTO cars (make, model, year, price, currency, created_at) VALUES (?, ?, ?, ?, ?, ?)'
+
+
+def on_demand_insights(db: sqlite3.Connection) -> dict:
+    """The same payload as get_insights, computed straight from cars and favorites."""
+    from app.services.analytics_service import (
+        ANALYTICS_CURRENCY, GROWTH_MONTHS, PRICE_BUCKET_LABELS, TOP_MAKES, WATCHLIST_SIZE, _round,
+    )
+
+    totals = db.execute('''
+        SELECT COUNT(*) AS listings, AVG(CASE WHEN price > 0 THEN price END) AS average,
+               MIN(CASE WHEN price > 0 THEN price END) AS min_price,
+               MAX(CASE WHEN price > 0 THEN price END) AS max_price
+        FROM cars
+    ''').fetchone()
+    summary = {
+        'currency': ANALYTICS_CURRENCY,
+        'average_price': _round(totals['average']),
+        'min_price': _round(totals['min_price']),
+        'max_price': _round(totals['max_price']),
+        'total_listings': totals['listings'],
+        'favorites_count': db.execute('SELECT COUNT(*) FROM favorites').fetchone()[0],
+    }
+    top_makes = [
+        {'make': row['make'], 'avg_price': _round(row['average']), 'listings': row['listings']}
+        for row in db.execute('''
+            SELECT make, COUNT(*) AS listings, AVG(CASE WHEN price > 0 THEN price END) AS average
+            FROM cars GROUP BY make ORDER BY listings DESC, make ASC LIMIT ?
+        ''', (TOP_MAKES,))
+    ]
+    buckets = {row[0]: row[1] for row in db.execute('''
+        SELECT CASE WHEN price IS NULL OR price <= 0 THEN -1 WHEN price < 10000 THEN 0
+                    WHEN price < 30000 THEN 1 WHEN price < 60000 THEN 2 ELSE 3 END, COUNT(*)
+        FROM cars GROUP BY 1
+    ''')}
+    running, growth = 0, []
+    for row in db.execute('''
+        SELECT strftime('%Y-%m', created_at) AS month, COUNT(*) AS listings FROM cars
+        WHERE created_at IS NOT NULL GROUP BY month ORDER BY month
+    '''):
+        running += row['listings']
+        growth.append({'label': datetime.strptime(row['month'], '%Y-%m').strftime('%b'), 'value': running})
+    watchlist = [
+        dict(row) for row in db.execute('''
+            SELECT c.id, c.make, c.model, c.price, c.currency, COUNT(*) AS favorites
+            FROM favorites f JOIN cars c ON c.id = f.car_id
+            GROUP BY c.id ORDER BY favorites DESC LIMIT ?
+        ''', (WATCHLIST_SIZE,))
+    ]
+    return {
+        'summary': summary,
+        'market_top_makes': top_makes,
+        'price_distribution': [{'bucket': label, 'count': buckets.get(bucket, 0)}
+                               for bucket, label in PRICE_BUCKET_LABELS.items()],
+        'growth_trends': growth[-GROWTH_MONTHS:],
+        'watchlist': watchlist,
+    }
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def insert_cost(db: sqlite3.Connection, drop_triggers: bool) -> float:
+    """Microseconds per insert for TRIGGER_SAMPLE rows, rolled back afterwards."""
+    db.execute('BEGIN')
+    if drop_triggers:
+        for suffix in ('ai', 'au', 'ad'):
+            db.execute(f'DROP TRIGGER analytics_cars_{suffix}')
+    started = time.perf_counter()
+    db.executemany(INSERT_CAR, car_rows(TRIGGER_SAMPLE, seed=11))
+    elapsed = time.perf_counter() - started
+    db.rollback()
+    return elapsed / TRIGGER_SAMPLE * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=1_000_000)
+    parser.add_argument('--favorites', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.db import connect
+    from app.services.analytics_service import get_insights
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        create_app({'DATABASE': db_path, 'SESSION_REAPER_INTERVAL': 0, 'QUERY_CACHE_SHARED': False})
+        db = connect(db_path, {'journal_mode': 'WAL', 'synchronous': 'OFF'})
+        db.isolation_level = None
+
+        started = time.perf_counter()
+        db.execute('BEGIN')
+        db.executemany(INSERT_CAR, car_rows(args.cars))
+        db.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@example.com', 'x')")
+        rng = random.Random(3)
+        # Skewed so the watchlist has a clear top
+        db.executemany(
+            'INSERT OR IGNORE INTO favorites (user_id, car_id) VALUES (1, ?)',
+            ((min(int(rng.paretovariate(1.2)), args.cars),) for _ in range(args.favorites)),
+        )
+        db.execute('COMMIT')
+        db.execute('ANALYZE')
+        print(f'Seeded {args.cars} cars in {time.perf_counter() - started:.1f}s')
+
+        materialized = get_insights(db)
+        on_demand = on_demand_insights(db)
+        # Watchlist ties may come back in a different order
+        for payload in (materialized, on_demand):
+            payload['watchlist'] = sorted(payload['watchlist'], key=lambda car: (-car['favorites'], car['id']))
+        print('payloads match' if materialized == on_demand else 'PAYLOADS DIFFER')
+
+        print(f"\n{'insights':>14} {'ms (best of %d)' % args.repeat:>18}")
+        print(f"{'on-demand':>14} {best_of(lambda: on_demand_insights(db), args.repeat):>18.2f}")
+        print(f"{'materialized':>14} {best_of(lambda: get_insights(db), args.repeat):>18.2f}")
+
+        with_triggers = insert_cost(db, drop_triggers=False)
+        without = insert_cost(db, drop_triggers=True)
+        print(f'\ninsert: {without:.1f} us/row without analytics triggers, '
+              f'{with_triggers:.1f} us/row with (+{with_triggers - without:.1f})')
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
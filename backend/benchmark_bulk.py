@@ -0,0 +1,76 @@
+"""Listing upload throughput: POST /api/cars per car vs one POST /api/cars/bulk.
+
+Uploads the same lot of --cars listings into a scratch database both ways,
+for each synchronous setting (FULL fsyncs the WAL on every commit, NORMAL
+only at checkpoints), and reports cars per second.
+
+    python benchmark_bulk.py --cars 500 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+
+def lot(cars: int) -> list[dict]:
+    rng = random.Random(7)
+    return [
+        {
+            'make': f'Make{i % 40}', 'model': f'Model{i % 300}', 'year': 2005 + i % 20,
+            'price': rng.randint(20000, 400000), 'currency': 'AED',
+            'description': 'A well kept example with full service history.',
+            'specs': {'bodyStyle': rng.choice(['Sedan', 'SUV', 'Coupe']), 'horsepower': rng.randint(120, 520)},
+        }
+        for i in range(cars)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    listings = lot(args.cars)
+    ndjson = ''.join(json.dumps(listing) + '\n' for listing in listings)
+    print(f'{args.cars} cars per upload, best of {args.repeat}')
+    print(f"{'synchronous':>12} {'mode':>14} {'seconds':>9} {'cars/s':>10}")
+    for synchronous in ('FULL', 'NORMAL'):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'DATABASE': os.path.join(tmp, 'bench.db'), 'DB_SYNCHRONOUS': synchronous,
+                'SESSION_REAPER_INTERVAL': 0, 'QUERY_CACHE_SHARED': False,
+            })
+            client = app.test_client()
+
+            def per_car():
+                for listing in listings:
+                    assert client.post('/api/cars', json=listing).status_code == 201
+
+            def bulk_json():
+                assert client.post('/api/cars/bulk', json=listings).get_json()['inserted'] == args.cars
+
+            def bulk_ndjson():
+                response = client.post('/api/cars/bulk', data=ndjson, content_type='application/x-ndjson')
+                assert response.get_json()['inserted'] == args.cars
+
+            for mode, upload in (('per-car POST', per_car), ('bulk JSON', bulk_json), ('bulk NDJSON', bulk_ndjson)):
+                best = float('inf')
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    upload()
+                    best = min(best, time.perf_counter() - started)
+                print(f'{synchronous:>12} {mode:>14} {best:>9.3f} {args.cars / best:>10,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Mixed read/write SQLite benchmark: pooled WAL connections vs. one per request.
+
+Runs the same request-shaped workload (listing page reads plus favorite
+writes, each inside its own app context like a real request) across several
+processes x threads against a scratch database, once per configuration, and
+prints throughput, latency percentiles and lock errors.
+
+    python benchmark_db.py --processes 4 --threads 8 --ops 500 --write-ratio 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+# Shared by every mode; DB_* keys are overridden per configuration below
+BASE_CONFIG = {
+    'MODEL_WARMUP': 'off',
+    'SESSION_REAPER_INTERVAL': 0,
+}
+CONFIGS = {
+    # What get_db did before pooling: fresh connection, rollback journal, no tuning
+    'per-request': {
+        'DB_POOL_SIZE': 0,
+        'DB_JOURNAL_MODE': 'DELETE',
+        'DB_SYNCHRONOUS': '',
+        'DB_CACHE_SIZE': '',
+        'DB_MMAP_SIZE': '',
+        'DB_TEMP_STORE': '',
+    },
+    'per-request+wal': {'DB_POOL_SIZE': 0},
+    'pooled+wal': {},
+}
+
+READ_QUERY = 'SELECT * FROM cars ORDER BY created_at DESC, id DESC LIMIT 20'
+
+
+def seed(db_path: str, cars: int, users: int) -> None:
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO cars (make, model, year, price, description, specs) VALUES (?, ?, ?, ?, ?, ?)',
+        (
+            (f'Make{i % 40}', f'Model{i % 300}', 2000 + i % 25, 10000 + i * 7 % 90000,
+             'Benchmark listing', '{"bodyStyle": "Sedan"}')
+            for i in range(cars)
+        ),
+    )
+    conn.executemany(
+        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+        ((f'bench{i}', f'bench{i}@example.com', 'x') for i in range(users)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def make_app(db_path: str, mode: str):
+    from app import create_app
+    return create_app({'DATABASE': db_path, **BASE_CONFIG, **CONFIGS[mode]})
+
+
+def run_worker(db_path: str, mode: str, threads: int, ops: int, write_ratio: float,
+               cars: int, users: int, ready, results) -> None:
+    from app.db import get_db
+
+    app = make_app(db_path, mode)
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def loop(worker_seed: int) -> None:
+        rng = random.Random(worker_seed)
+        local, failed = [], 0
+        for _ in range(ops):
+            started = time.perf_counter()
+            try:
+                with app.app_context():
+                    db = get_db()
+                    if rng.random() < write_ratio:
+                        user_id, car_id = rng.randint(1, users), rng.randint(1, cars)
+                        db.execute(
+                            'DELETE FROM favorites WHERE user_id = ? AND car_id = ?', (user_id, car_id)
+                        )
+                        db.execute(
+                            'INSERT INTO favorites (user_id, car_id) VALUES (?, ?)', (user_id, car_id)
+                        )
+                        db.commit()
+                    else:
+                        db.execute(READ_QUERY).fetchall()
+            except sqlite3.OperationalError:
+                failed += 1
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    pool = [
+        threading.Thread(target=loop, args=(os.getpid() * 1000 + i,)) for i in range(threads)
+    ]
+    # Start timing only once every process has booted its app
+    ready.wait()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+
+def benchmark(mode: str, processes: int, threads: int, ops: int, write_ratio: float,
+              cars: int, users: int) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        make_app(db_path, mode)  # creates the schema
+        seed(db_path, cars, users)
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        ready = ctx.Barrier(processes + 1)
+        workers = [
+            ctx.Process(
+                target=run_worker,
+                args=(db_path, mode, threads, ops, write_ratio, cars, users, ready, results),
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        ready.wait()
+        started = time.perf_counter()
+        collected = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+    latencies = sorted(latency for batch, _ in collected for latency in batch)
+    errors = sum(failed for _, failed in collected)
+    return {
+        'ops_per_sec': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+        'errors': errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=500, help='Requests per thread')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--cars', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--mode', choices=sorted(CONFIGS), action='append',
+                        help='Configuration to run (repeatable, default: all)')
+    args = parser.parse_args()
+
+    print(f'{args.processes} processes x {args.threads} threads x {args.ops} ops, '
+          f'{args.write_ratio:.0%} writes')
+    for mode in args.mode or CONFIGS:
+        stats = benchmark(mode, args.processes, args.threads, args.ops, args.write_ratio,
+                          args.cars, args.users)
+        print(f"{mode:>16}: {stats['ops_per_sec']:8.0f} ops/s  p50 {stats['p50_ms']:6.2f} ms  "
+              f"p99 {stats['p99_ms']:7.2f} ms  errors {stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Login throughput per core at each PASSWORD_HASH_METHOD cost.
+
+For every method, builds an app on a scratch database, signs a user up and
+times --logins POST /api/auth/login calls from one thread, so the rate is
+what a single core sustains. The raw verify rate shows how much of a login
+is the hash itself.
+
+    python benchmark_passwords.py --logins 20
+    python benchmark_passwords.py --methods pbkdf2:sha256:600000 scrypt:32768:8:1
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+METHODS = [
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--methods', nargs='+', default=METHODS)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    print(f"{'method':>24} {'verify/s':>9} {'logins/s/core':>14} {'ms/login':>9}")
+    for method in args.methods:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({'DATABASE': os.path.join(tmp, 'bench.db'), 'SESSION_REAPER_INTERVAL': 0,
+                              'QUERY_CACHE_SHARED': False, 'PASSWORD_HASH_METHOD': method})
+            client = app.test_client()
+            credentials = {'email': 'bench@example.com', 'password': 'correct horse battery staple'}
+            assert client.post('/api/auth/signup', json={'username': 'bench', **credentials}).status_code == 201
+
+            hasher = app.extensions['password_hasher']
+            stored = hasher.hash(credentials['password'])
+            started = time.perf_counter()
+            for _ in range(args.logins):
+                hasher.verify(stored, credentials['password'])
+            verify_rate = args.logins / (time.perf_counter() - started)
+
+            started = time.perf_counter()
+            for _ in range(args.logins):
+                assert client.post('/api/auth/login', json=credentials).status_code == 200
+            elapsed = time.perf_counter() - started
+            print(f'{method:>24} {verify_rate:>9.1f} {args.logins / elapsed:>14.1f} '
+                  f'{elapsed / args.logins * 1000:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
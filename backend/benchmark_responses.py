@@ -0,0 +1,139 @@
+"""Car list response size and serialization cost per page, by representation.
+
+Seeds a scratch database with listings shaped like the ingested catalog
+(several engines, a media gallery, statistics) and compares, per page:
+
+    legacy   SELECT * + car_row_to_dict + jsonify (json.loads then re-encode)
+    full     every field, JSON columns spliced in raw (GET /api/cars)
+    summary  GET /api/cars?fields=summary
+    minimal  GET /api/cars?fields=make,model,price
+
+plus /api/favorites and the single-car endpoint, once with the stdlib JSON
+provider and once with orjson.
+
+    python benchmark_responses.py --cars 5000 --limit 20 --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+
+def seed(db_path: str, cars: int) -> None:
+    rng = random.Random(7)
+    rows = []
+    for i in range(cars):
+        engines = [
+            {
+                'name': f'{rng.choice([1.5, 2.0, 2.5, 3.5])}L trim {n}',
+                'powerHp': rng.randint(120, 520),
+                'torqueNm': rng.randint(150, 700),
+                'transmission': 'Automatic',
+                'fuelEconomyLPer100km': round(rng.uniform(5, 15), 1),
+                'price': rng.randint(60000, 400000),
+            }
+            for n in range(rng.randint(2, 6))
+        ]
+        images = [f'https://cdn.example.com/cars/{i}/{n}.jpg' for n in range(rng.randint(3, 8))]
+        media = [{'type': 'image', 'url': url, 'label': f'Car {i}', 'source': 'engine-specs-sql'} for url in images]
+        rows.append((
+            f'Make{i % 40}', f'Model{i % 300}', 2005 + i % 20, rng.randint(20000, 400000),
+            'AED', 'A well kept example with full service history. ' * 4,
+            images[0], json.dumps(images), json.dumps(images), json.dumps(media),
+            round(rng.uniform(3, 5), 1), rng.randint(10, 400),
+            json.dumps({'bodyStyle': rng.choice(['Sedan', 'SUV', 'Coupe']), 'engine': '2.0L I4',
+                        'drivetrain': 'FWD', 'seats': 5}),
+            json.dumps(engines),
+            json.dumps({'Engine Specs': len(engines), 'Body Styles': 1, 'Views': rng.randint(0, 9999)}),
+        ))
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO cars (make, model, year, price, currency, description, image_url, image_urls,
+                          gallery_images, media_gallery, rating, reviews, specs, engines, statistics)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=20, help='Page size')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    from flask import jsonify
+    from app import create_app
+    from app.db import get_db
+    from app.routes.cars import car_row_to_dict
+    from app.services.car_projection import parse_fields, render_cars, select_list
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        config = {'DATABASE': db_path, 'SESSION_REAPER_INTERVAL': 0,
+                  'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000'}
+        create_app(config)
+        seed(db_path, args.cars)
+        page = f'SELECT {{}} FROM cars c ORDER BY c.created_at DESC, c.id DESC LIMIT {args.limit}'
+
+        for backend in ('stdlib', 'orjson'):
+            app = create_app({**config, 'JSON_BACKEND': backend})
+            client = app.test_client()
+            signup = client.post('/api/auth/signup', json={
+                'username': backend, 'email': f'{backend}@example.com', 'password': 'benchmark'})
+            headers = {'Authorization': f"Bearer {signup.get_json()['token']}"}
+            for car_id in range(1, args.limit + 1):
+                client.post('/api/favorites', json={'car_id': car_id}, headers=headers)
+
+            print(f'\n{type(app.json).__name__}: {args.limit} cars per page, {args.repeat} repeats')
+            print(f"{'payload':>18} {'bytes':>8} {'serialize ms':>13} {'request ms':>11}")
+            with app.test_request_context():
+                db = get_db()
+                rows = db.execute(page.format('c.*')).fetchall()
+
+                def legacy():
+                    return jsonify({'success': True, 'cars': [car_row_to_dict(row) for row in rows]}).get_data()
+
+                print(f"{'legacy list':>18} {len(legacy()):>8} {timed(legacy, args.repeat):>13.3f} {'-':>11}")
+
+                cases = (
+                    ('cars full', '/api/cars', ''),
+                    ('cars summary', '/api/cars', 'summary'),
+                    ('cars minimal', '/api/cars', 'make,model,price'),
+                    ('favorites', '/api/favorites', ''),
+                    ('favorites summary', '/api/favorites', 'summary'),
+                )
+                for name, path, fields_param in cases:
+                    fields = parse_fields(fields_param)
+                    projected = db.execute(page.format(select_list(fields))).fetchall()
+                    url = f'{path}?limit={args.limit}' + (f'&fields={fields_param}' if fields_param else '')
+                    size = len(client.get(url, headers=headers).get_data())
+                    serialize = timed(lambda: render_cars(projected, fields), args.repeat)
+                    request = timed(lambda: client.get(url, headers=headers).get_data(), args.repeat)
+                    print(f'{name:>18} {size:>8} {serialize:>13.3f} {request:>11.3f}')
+
+                # Single-car responses still decode JSON and go through jsonify
+                car = car_row_to_dict(rows[0])
+                single = lambda: jsonify({'success': True, 'car': car}).get_data()
+                request = timed(lambda: client.get('/api/cars/1').get_data(), args.repeat)
+                print(f"{'car detail':>18} {len(single()):>8} {timed(single, args.repeat):>13.3f} {request:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""GET /api/cars?search= latency: LIKE scan vs the FTS5 index.
+
+Seeds a scratch database with --cars listings and times a set of search
+terms through the route: with SEARCH_FTS off (the LIKE fallback over
+make/model), on (cars_fts MATCH with bm25 ranking), and on with an explicit
+sort (no ranking). LIKE with LIMIT can stop at the first matches of a common
+term; terms that match little or nothing make it scan the whole table.
+
+    python benchmark_search.py --cars 200000 --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+MAKES = ['Toyota', 'Nissan', 'BMW', 'Mercedes-Benz', 'Ford', 'Lexus', 'Hyundai', 'Kia', 'Porsche', 'Audi']
+MODELS = ['Camry', 'Patrol', '3-Series', 'C-Class', 'F-150', 'LX', 'Sonata', 'Sportage', 'Cayenne', 'A6']
+TERMS = ['camry', 'toy', 'patrol', 'mercedes', 'f-150', 'suv', 'cayenne turbo', 'chiron', 'zzz']
+
+
+def seed(db_path: str, cars: int) -> None:
+    rng = random.Random(7)
+
+    def generate():
+        for i in range(cars):
+            make = rng.randrange(len(MAKES))
+            # A rare listing: the case where a LIKE scan can't stop early
+            name = ('Bugatti', 'Chiron') if i % 10000 == 0 else (
+                MAKES[make], f'{MODELS[make]} {rng.choice(["", "Turbo", "Hybrid", "Sport"])}'.strip())
+            yield (
+                *name,
+                2005 + i % 20, rng.randint(20000, 400000),
+                'A well kept example with full service history and low mileage.',
+                json.dumps({'bodyStyle': rng.choice(['Sedan', 'SUV', 'Coupe', 'Pickup']),
+                            'engine': rng.choice(['2.0L I4', '3.5L V6', '5.6L V8'])}),
+            )
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO cars (make, model, year, price, description, specs) VALUES (?, ?, ?, ?, ?, ?)',
+        generate(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cars', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        app = create_app({'DATABASE': db_path, 'SESSION_REAPER_INTERVAL': 0,
+                          'QUERY_CACHE_MAX_BYTES': 0, 'QUERY_CACHE_SHARED': False})
+        started = time.perf_counter()
+        seed(db_path, args.cars)
+        print(f'Seeded {args.cars} cars in {time.perf_counter() - started:.1f}s')
+        client = app.test_client()
+        fts_available = app.config['SEARCH_FTS']
+
+        print(f"\n{'term':>14} {'LIKE ms':>9} {'hits':>5} {'FTS ms':>9} {'hits':>5} {'FTS newest ms':>14}")
+        for term in TERMS:
+            url = f'/api/cars?search={term}&limit={args.limit}&fields=id,make,model'
+            results = []
+            for use_fts, sort in ((False, ''), (True, ''), (True, '&sort=newest')):
+                app.config['SEARCH_FTS'] = use_fts and fts_available
+                hits = len(client.get(url + sort).get_json()['cars'])
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    client.get(url + sort).get_data()
+                results.append(((time.perf_counter() - started) / args.repeat * 1000, hits))
+            (like_ms, like_hits), (fts_ms, fts_hits), (newest_ms, _) = results
+            print(f'{term:>14} {like_ms:>9.2f} {like_hits:>5} {fts_ms:>9.2f} {fts_hits:>5} {newest_ms:>14.2f}')
+        app.config['SEARCH_FTS'] = fts_available
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Authenticated request throughput with the session cache on and off.
+
+Seeds a scratch database with --users signed-in users among --sessions
+sessions in total, then sends --requests authenticated requests from
+--threads threads (one test client each, random tokens) to
+/api/auth/verify and /api/favorites with SESSION_CACHE_SIZE 0 and with the
+cache enabled.
+
+    python benchmark_sessions.py --sessions 200000 --users 500 --requests 20000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+
+def seed(db_path: str, sessions: int, users: int) -> list[str]:
+    """Insert users and sessions directly (no password hashing); returns active tokens."""
+    expires = (datetime.utcnow() + timedelta(days=7)).isoformat(sep=' ')
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+        ((f'user{i}', f'user{i}@example.com', 'x') for i in range(users)),
+    )
+    tokens = [f'active-token-{i}' for i in range(users)]
+    conn.executemany(
+        'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+        ((token, i + 1, expires) for i, token in enumerate(tokens)),
+    )
+    conn.executemany(
+        'INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, ?, ?)',
+        ((f'old-token-{i}', i % users + 1, expires) for i in range(sessions - users)),
+    )
+    conn.commit()
+    conn.close()
+    return tokens
+
+
+def run(app, tokens: list[str], path: str, requests: int, threads: int) -> float:
+    """Requests per second for ``path`` spread over ``threads`` threads."""
+    per_thread = requests // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int) -> None:
+        client = app.test_client()
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(per_thread):
+            response = client.get(path, headers={'Authorization': f'Bearer {rng.choice(tokens)}'})
+            assert response.status_code == 200, response.status_code
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        config = {'DATABASE': db_path, 'SESSION_REAPER_INTERVAL': 0, 'QUERY_CACHE_SHARED': False}
+        create_app(config)
+        tokens = seed(db_path, args.sessions, args.users)
+        print(f'{args.sessions} sessions, {args.users} active users, '
+              f'{args.requests} requests over {args.threads} threads')
+        print(f"{'endpoint':>18} {'cache off req/s':>16} {'cache on req/s':>15} {'hit rate':>9}")
+        for path in ('/api/auth/verify', '/api/favorites'):
+            results = []
+            for size in (0, 10000):
+                app = create_app({**config, 'SESSION_CACHE_SIZE': size})
+                # Untimed pass so both runs start from a warm page cache
+                run(app, tokens, path, min(args.requests, 1000), 1)
+                results.append(run(app, tokens, path, args.requests, args.threads))
+            stats = app.extensions['session_cache'].stats()
+            hit_rate = stats['hits'] / ((stats['hits'] + stats['misses']) or 1)
+            print(f'{path:>18} {results[0]:>16,.0f} {results[1]:>15,.0f} {hit_rate:>9.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+# Picked up automatically by `gunicorn run:app` when started from backend/.
+
+def post_fork(server, worker):
+    # Without preload_app each worker builds its own app, and create_app
+    # starts the warm-up and the session reaper there.
+    if not server.cfg.preload_app:
+        return
+    flask_app = server.app.wsgi()
+
+    # Threads don't survive fork: give each worker its own reaper
+    from app.services.session_reaper import session_reaper
+    session_reaper.start(flask_app.config['DATABASE'])
+
+    # With preload_app the master may have forked mid warm-up; make sure each
+    # worker finishes (or starts) its own so /api/health turns ready, honoring
+    # MODEL_WARMUP the same way create_app does.
+    mode = flask_app.config['MODEL_WARMUP']
+    if mode == 'off':
+        return
+    from app.services.ai_service import ai_service
+    ai_service.start_warm_up(background=mode != 'sync')
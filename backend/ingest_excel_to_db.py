@@ -6,11 +6,13 @@ import re
 import sqlite3
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "intelliwheels.db"
 SQL_DUMP_PATH = BASE_DIR / "data" / "Middle-East-GCC-Car-Database-by-Teoalida-SAMPLE.sql"
+# The engine specs table; other tables in the dump are not catalog rows
+SQL_DUMP_TABLE = "middle_east_gcc_car_database_sample"
 
 STAR_PATTERN = re.compile(r"star(\d+(?:\.\d+)?)", re.IGNORECASE)
 CURRENCY_RATES = {
@@ -160,55 +162,132 @@ def init_db() -> None:
     conn.close()
 
 
-def load_sql_dump(path: Path) -> List[Dict[str, str]]:
-    """Load the MySQL dump by replaying it inside an in-memory SQLite DB."""
-    if not path.exists():
-        raise FileNotFoundError(f"SQL dump not found at {path}")
+# Statements a dump may carry that have nothing to ingest
+_SKIPPED_STATEMENTS = ("SET ", "START TRANSACTION", "COMMIT", "UNLOCK TABLES", "LOCK TABLES", "DROP TABLE")
+# A complete single-quoted MySQL string, with backslash or doubled-quote escapes
+_SQL_STRING = r"'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'"
+# Statement splitting: strings and identifiers are skipped whole so a ";" inside
+# them doesn't end the statement; a lone quote opens a string that continues on
+# the next line
+_STATEMENT_TOKEN = re.compile(_SQL_STRING + r"|`[^`]*`|'|;", re.DOTALL)
+_INSERT_HEADER = re.compile(
+    r"INSERT\s+(?:IGNORE\s+)?INTO\s+`?([^`\s(]+)`?\s*(\((?:`[^`]*`|[^`)])*\))?\s*VALUES\s*",
+    re.IGNORECASE,
+)
+_CREATE_TABLE = re.compile(r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?([^`\s(]+)`?", re.IGNORECASE)
+_COLUMN_NAME = re.compile(r"`([^`]*)`")
+_CREATE_COLUMN = re.compile(r"^\s*`([^`]*)`", re.MULTILINE)
+# One token of a VALUES list: quoted string, bare literal (number, NULL) or punctuation
+_VALUE_TOKEN = re.compile(r"(" + _SQL_STRING + r")|([^\s,()';]+)|([(),;])", re.DOTALL)
+_STRING_ESCAPE = re.compile(r"\\(.)|''", re.DOTALL)
+_MYSQL_ESCAPES = {"0": "\0", "b": "\b", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value and "''" not in value:
+        return value
+    return _STRING_ESCAPE.sub(
+        lambda match: _MYSQL_ESCAPES.get(match.group(1), match.group(1)) if match.group(1) else "'",
+        value,
+    )
 
-    raw_sql = path.read_text(encoding="utf-8")
 
-    sanitized_lines: List[str] = []
-    skip_comment = False
-    for line in raw_sql.splitlines():
-        stripped = line.strip()
-        if not stripped:
-            continue
-        if stripped.startswith("--"):
-            continue
-        if stripped.startswith("/*"):
-            skip_comment = True
-            if "*/" in stripped:
-                skip_comment = False
-            continue
-        if skip_comment:
-            if "*/" in stripped:
-                skip_comment = False
-            continue
-        upper = stripped.upper()
-        if upper.startswith(("SET ", "START TRANSACTION", "COMMIT", "UNLOCK TABLES", "LOCK TABLES")):
+def iter_sql_statements(lines: Iterable[str]) -> Iterator[str]:
+    """Split a MySQL dump into statements, holding at most one in memory.
+
+    Comment lines, SET/LOCK/transaction statements and /*!...*/ version
+    directives between statements are dropped; quotes are tracked so a ";"
+    inside a string doesn't end the statement.
+    """
+    parts: List[str] = []
+    carry = ""
+    in_comment = False
+    for line in lines:
+        if not parts and not carry:
+            stripped = line.strip()
+            if in_comment or stripped.startswith("/*"):
+                in_comment = "*/" not in stripped
+                continue
+            if not stripped or stripped.startswith(("--", "#")):
+                continue
+            if stripped.upper().startswith(_SKIPPED_STATEMENTS):
+                continue
+        text = carry + line
+        carry = ""
+        start = 0
+        for match in _STATEMENT_TOKEN.finditer(text):
+            token = match.group()
+            if token == ";":
+                parts.append(text[start:match.end()])
+                yield "".join(parts).strip()
+                parts = []
+                start = match.end()
+            elif token == "'":
+                # Unterminated on this line: rescan it together with the next
+                carry = text[match.start():]
+                text = text[:match.start()]
+                break
+        rest = text[start:]
+        if parts or rest.strip():
+            parts.append(rest)
+    if carry or "".join(parts).strip():
+        raise ValueError("SQL dump ends inside an unterminated statement")
+
+
+def iter_insert_rows(statement: str, columns: Sequence[str]) -> Iterator[Dict[str, Optional[str]]]:
+    """Yield each VALUES tuple of one INSERT statement as a column -> text dict.
+
+    Values stay text, as in the varchar columns of the source table; NULL
+    becomes None.
+    """
+    header = _INSERT_HEADER.match(statement)
+    values: List[Optional[str]] = []
+    in_tuple = False
+    for match in _VALUE_TOKEN.finditer(statement, header.end()):
+        quoted, bare, punct = match.groups()
+        if punct == "(":
+            in_tuple = True
+            values = []
+        elif punct == ")":
+            if len(values) != len(columns):
+                raise ValueError(f"Row has {len(values)} values for {len(columns)} columns")
+            yield dict(zip(columns, values))
+            in_tuple = False
+        elif not in_tuple:
             continue
-        if stripped.startswith("/*!") and stripped.endswith("*/;"):
-            continue
-        sanitized_lines.append(line)
+        elif quoted is not None:
+            values.append(_unescape(quoted[1:-1]))
+        elif bare is not None:
+            values.append(None if bare.upper() == "NULL" else bare)
 
-    sanitized_sql = "\n".join(sanitized_lines)
-    sanitized_sql = re.sub(r"/\*!.*?\*/;", "", sanitized_sql, flags=re.DOTALL)
-    sanitized_sql = re.sub(r"\)\s*ENGINE=.*?;", ");", sanitized_sql, flags=re.IGNORECASE)
-    sanitized_sql = sanitized_sql.replace("\\'", "''")
 
-    conn = sqlite3.connect(":memory:")
-    try:
-        conn.executescript(sanitized_sql)
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(middle_east_gcc_car_database_sample)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if not columns:
-            raise RuntimeError("Failed to read table columns from SQL dump")
-        cursor.execute("SELECT * FROM middle_east_gcc_car_database_sample")
-        rows = cursor.fetchall()
-        return [dict(zip(columns, row)) for row in rows]
-    finally:
-        conn.close()
+def load_sql_dump(path: Path, table: Optional[str] = None) -> Iterator[Dict[str, Optional[str]]]:
+    """Stream engine rows out of the MySQL dump, one INSERT statement at a time.
+
+    Rows of every table are yielded unless ``table`` is given. INSERTs
+    without a column list use the columns of the table's CREATE TABLE.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"SQL dump not found at {path}")
+
+    table_columns: Dict[str, List[str]] = {}
+    with path.open(encoding="utf-8") as handle:
+        for statement in iter_sql_statements(handle):
+            created = _CREATE_TABLE.match(statement)
+            if created:
+                body = statement[statement.index("(") + 1:]
+                table_columns[created.group(1)] = _CREATE_COLUMN.findall(body)
+                continue
+            header = _INSERT_HEADER.match(statement)
+            if not header or (table and header.group(1) != table):
+                continue
+            if header.group(2):
+                columns = _COLUMN_NAME.findall(header.group(2))
+            else:
+                columns = table_columns.get(header.group(1))
+            if not columns:
+                raise RuntimeError(f"Failed to read table columns for {header.group(1)} from SQL dump")
+            yield from iter_insert_rows(statement, columns)
 
 
 def build_groups(records: Iterable[Dict[str, str]]) -> Dict[Tuple[str, str, int], CarGroup]:
@@ -394,10 +473,16 @@ def insert_groups(groups: Dict[Tuple[str, str, int], CarGroup]) -> int:
 def main() -> None:
     print("🚗 IntelliWheels SQL ingestion")
     print(f"📂 Reading dump: {SQL_DUMP_PATH}")
-    records = load_sql_dump(SQL_DUMP_PATH)
-    print(f"📥 Parsed {len(records)} raw engine rows")
+    parsed = 0
+
+    def counted(records: Iterable[Dict[str, Optional[str]]]) -> Iterator[Dict[str, Optional[str]]]:
+        nonlocal parsed
+        for record in records:
+            parsed += 1
+            yield record
 
-    groups = build_groups(records)
+    groups = build_groups(counted(load_sql_dump(SQL_DUMP_PATH, table=SQL_DUMP_TABLE)))
+    print(f"📥 Parsed {parsed} raw engine rows")
     print(f"🧩 Consolidated into {len(groups)} make/model/year groups")
 
     init_db()
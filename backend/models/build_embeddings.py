@@ -1,11 +1,33 @@
-"""Generate semantic embeddings for the IntelliWheels catalog."""
+"""Generate semantic embeddings for the IntelliWheels catalog.
+
+Embeddings are written as a binary store next to this script:
+
+* ``car_embeddings.npy`` - float32 matrix, one L2-normalized row per car
+* ``car_embeddings.ids.npy`` - int64 car ids, aligned with the matrix rows
+* ``car_embeddings.meta.json`` - model name, dimension, row count and checksum
+* ``car_embeddings.hashes.npy`` - content hash of each car's document text
+
+The Flask app memory-maps the ``.npy`` files so every worker on a host shares
+one page-cache copy. ``--from-json`` converts a legacy ``car_embeddings.json``.
+``--incremental`` re-encodes only cars whose document hash changed since the
+previous build and drops vectors for deleted cars.
+
+Cars are streamed from SQLite in ``--chunk-size`` blocks and each block is
+encoded and appended to the output files before the next one is read, so peak
+memory depends on the chunk size rather than the catalog size. On CPU-only
+hosts ``--workers N`` encodes each block's shards in a pool of N processes;
+``--benchmark`` reports documents/second for several worker counts.
+"""
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import os
 import sqlite3
+import time
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
@@ -13,70 +35,450 @@ from sentence_transformers import SentenceTransformer
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_DB = BASE_DIR.parent / "intelliwheels.db"
-OUTPUT_PATH = BASE_DIR / "car_embeddings.json"
+OUTPUT_BASE = BASE_DIR / "car_embeddings"
+LEGACY_JSON_PATH = BASE_DIR / "car_embeddings.json"
 DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_BATCH_SIZE = 64
+BENCHMARK_WORKERS = (1, 2, 4, 8)
+STORE_FORMAT = 1
+HASH_DTYPE = "S16"
+
+# Spec fields are extracted by SQLite so rows never go through json.loads
+CARS_QUERY = """
+    SELECT
+        id, make, model, year, price, currency, rating,
+        CASE WHEN json_valid(specs) THEN json_extract(specs, '$.bodyStyle') END AS bodyStyle,
+        CASE WHEN json_valid(specs) THEN json_extract(specs, '$.engine') END AS engine,
+        CASE WHEN json_valid(specs) THEN json_extract(specs, '$.fuelEconomy') END AS fuelEconomy
+    FROM cars
+    ORDER BY id
+"""
+SPEC_FIELDS = ("bodyStyle", "engine", "fuelEconomy")
+
+
+def count_cars(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM cars").fetchone()[0]
+
+
+def iter_car_chunks(conn: sqlite3.Connection, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Yield the cars table in id order, ``chunk_size`` rows at a time."""
+    yield from pd.read_sql_query(CARS_QUERY, conn, chunksize=chunk_size)
+
+
+def _segment(values: pd.Series, prefix: str = "") -> pd.Series:
+    """Render " | <prefix><value>" for truthy values and "" otherwise."""
+    present = values.notna() & values.astype(bool)
+    text = values.where(present, "").astype(str)
+    return (" | " + prefix + text).where(present, "")
+
+
+def build_documents(chunk: pd.DataFrame) -> pd.Series:
+    """Build the text embedded for each car using whole-column string operations.
+
+    Numeric columns are cast to fixed types first so the rendered text (and
+    therefore its content hash) does not depend on the dtypes pandas happened
+    to infer for a particular chunk.
+    """
+    year = pd.to_numeric(chunk["year"], errors="coerce").fillna(0).astype("int64")
+    rating = pd.to_numeric(chunk["rating"], errors="coerce").astype("float64")
+    price = pd.to_numeric(chunk["price"], errors="coerce").astype("float64")
+    currency = " " + chunk["currency"].fillna("AED").astype(str)
+
+    docs = chunk["make"].astype(str) + " " + chunk["model"].astype(str)
+    docs += _segment(year)
+    for key in SPEC_FIELDS:
+        docs += _segment(chunk[key], f"{key}: ")
+    docs += _segment(rating, "rating ")
+    docs += _segment(price, "price ") + currency.where(price.fillna(0) != 0, "")
+    return docs
+
+
+def document_hash(doc: str) -> bytes:
+    return hashlib.blake2b(doc.encode("utf-8"), digest_size=16).digest()
+
+
+def store_paths(base: Path) -> Tuple[Path, Path, Path]:
+    """Return the (matrix, ids, metadata) file paths for a store base path."""
+    return (
+        base.with_name(base.name + ".npy"),
+        base.with_name(base.name + ".ids.npy"),
+        base.with_name(base.name + ".meta.json"),
+    )
+
+
+def hashes_path(base: Path) -> Path:
+    return base.with_name(base.name + ".hashes.npy")
+
+
+def _tmp_path(path: Path) -> Path:
+    # Keep the .npy suffix so numpy doesn't append another one
+    return path.with_name(f".{path.stem}.tmp.npy")
+
+
+class StoreWriter:
+    """Append embeddings chunk by chunk into a new store, then swap it in.
+
+    The output arrays are preallocated ``.npy`` memmaps in temporary files, so
+    only the chunk being written is held in memory. ``commit`` checksums the
+    files block by block and replaces the previous store; ``abort`` discards
+    the partial output.
+    """
+
+    def __init__(self, base: Path, count: int, dimension: int, with_hashes: bool = True) -> None:
+        self.base = base
+        self.count = count
+        self.dimension = dimension
+        self.offset = 0
+        matrix_path, ids_path, _ = store_paths(base)
+        self._outputs = [
+            (matrix_path, np.float32, (count, dimension)),
+            (ids_path, np.int64, (count,)),
+        ]
+        if with_hashes:
+            self._outputs.append((hashes_path(base), HASH_DTYPE, (count,)))
+        self._arrays = [
+            np.lib.format.open_memmap(_tmp_path(path), mode="w+", dtype=dtype, shape=shape)
+            for path, dtype, shape in self._outputs
+        ]
+
+    def append(
+        self,
+        car_ids: np.ndarray,
+        embeddings: np.ndarray,
+        hashes: Optional[np.ndarray] = None,
+    ) -> None:
+        end = self.offset + len(car_ids)
+        if end > self.count:
+            raise ValueError("More rows appended than the store was sized for")
+        self._arrays[0][self.offset:end] = embeddings
+        self._arrays[1][self.offset:end] = car_ids
+        if len(self._arrays) > 2:
+            self._arrays[2][self.offset:end] = hashes
+        self.offset = end
+
+    def _checksum(self, block_rows: int = 65536) -> str:
+        matrix, car_ids = self._arrays[0], self._arrays[1]
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(car_ids).tobytes())
+        for start in range(0, self.count, block_rows):
+            digest.update(np.ascontiguousarray(matrix[start:start + block_rows]).tobytes())
+        return f"sha256:{digest.hexdigest()}"
+
+    def commit(self, model_name: str) -> None:
+        if self.offset != self.count:
+            raise RuntimeError(f"Store expected {self.count} rows but received {self.offset}")
+        metadata = {
+            "format": STORE_FORMAT,
+            "model": model_name,
+            "dimension": int(self.dimension),
+            "count": int(self.count),
+            "dtype": "float32",
+            "checksum": self._checksum(),
+        }
+        for array in self._arrays:
+            array.flush()
+        self._arrays = []
+
+        for path, _, _ in self._outputs:
+            os.replace(_tmp_path(path), path)
+        if len(self._outputs) == 2 and hashes_path(self.base).exists():
+            # Stale hashes would make the next incremental run skip changed rows
+            hashes_path(self.base).unlink()
+
+        meta_path = store_paths(self.base)[2]
+        tmp_meta = meta_path.with_name(f".{meta_path.name}.tmp")
+        tmp_meta.write_text(json.dumps(metadata, indent=2))
+        os.replace(tmp_meta, meta_path)
 
+    def abort(self) -> None:
+        self._arrays = []
+        for path, _, _ in self._outputs:
+            _tmp_path(path).unlink(missing_ok=True)
 
-def load_cars(db_path: Path) -> pd.DataFrame:
+
+def write_store(
+    base: Path,
+    car_ids: np.ndarray,
+    embeddings: np.ndarray,
+    model_name: str,
+    hashes: Optional[np.ndarray] = None,
+) -> None:
+    """Write an in-memory set of embeddings as a store in one shot."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(car_ids):
+        raise ValueError("Embedding matrix and car id array do not line up")
+    writer = StoreWriter(base, len(car_ids), embeddings.shape[1], with_hashes=hashes is not None)
+    writer.append(car_ids, embeddings, hashes)
+    writer.commit(model_name)
+
+
+def convert_json(json_path: Path, base: Path, model_name: str) -> int:
+    """Convert a legacy car_embeddings.json payload into the binary store."""
+    payload = json.loads(json_path.read_text())
+    if not payload:
+        raise RuntimeError(f"No embeddings found in {json_path}")
+
+    car_ids = np.fromiter((item["car_id"] for item in payload), dtype=np.int64, count=len(payload))
+    embeddings = np.asarray([item["embedding"] for item in payload], dtype=np.float32)
+    write_store(base, car_ids, embeddings, model_name)
+    return len(payload)
+
+
+class PreviousStore(NamedTuple):
+    car_ids: np.ndarray
+    embeddings: np.ndarray
+    hashes: np.ndarray
+
+
+def load_previous_store(base: Path, model_name: str) -> Optional[PreviousStore]:
+    """Open the existing store for an incremental run.
+
+    Returns None when there is nothing reusable: no store, no content hashes
+    (e.g. converted from JSON), vectors produced by a different model, or ids
+    that are not in the ascending order every build writes.
+    """
+    matrix_path, ids_path, meta_path = store_paths(base)
+    if not (meta_path.exists() and hashes_path(base).exists()):
+        return None
+    metadata = json.loads(meta_path.read_text())
+    if metadata.get("model") != model_name:
+        print(f"ℹ️ Stored embeddings use {metadata.get('model')}, rebuilding from scratch")
+        return None
+
+    car_ids = np.load(ids_path)
+    embeddings = np.load(matrix_path, mmap_mode="r")
+    hashes = np.load(hashes_path(base))
+    if not (len(car_ids) == len(hashes) == embeddings.shape[0]):
+        return None
+    if np.any(car_ids[1:] <= car_ids[:-1]):
+        return None
+    return PreviousStore(car_ids, embeddings, hashes)
+
+
+class EmbeddingPipeline:
+    """Turn chunks of cars into (car_ids, embeddings, hashes) blocks.
+
+    With ``workers > 1`` documents are split into shards and encoded by a
+    sentence-transformers multi-process pool. The pool hands results back in
+    shard order, so each block stays in car_id order. Call ``close`` to stop
+    the pool.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int,
+        previous: Optional[PreviousStore],
+        workers: int = 1,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.previous = previous
+        self.workers = max(1, workers)
+        self.model: Optional[SentenceTransformer] = None
+        self.pool: Optional[Dict[str, Any]] = None
+        self.encoded = 0
+        self.skipped = 0
+        self.matched = 0
+
+    def dimension(self) -> int:
+        if self.previous is not None:
+            return self.previous.embeddings.shape[1]
+        return self._model().get_sentence_embedding_dimension()
+
+    def _model(self) -> SentenceTransformer:
+        if self.model is None:
+            print(f"🧠 Loading embedding model: {self.model_name}")
+            self.model = SentenceTransformer(self.model_name)
+        return self.model
+
+    def encode(self, docs: Sequence[str]) -> np.ndarray:
+        if self.workers == 1:
+            return self._model().encode(
+                list(docs),
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+            )
+
+        if self.pool is None:
+            # Split the cores between workers instead of letting every
+            # process start one torch thread per core
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+            print(f"🧵 Starting {self.workers} encoder processes")
+            self.pool = self._model().start_multi_process_pool(["cpu"] * self.workers)
+        # A few shards per worker keeps the processes evenly loaded
+        shard_size = max(1, -(-len(docs) // (self.workers * 4)))
+        embeddings = self._model().encode_multi_process(
+            list(docs), self.pool, batch_size=self.batch_size, chunk_size=shard_size
+        )
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+    def close(self) -> None:
+        if self.pool is not None:
+            SentenceTransformer.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+    def process(self, chunk: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        docs: List[str] = build_documents(chunk).tolist()
+        car_ids = chunk["id"].to_numpy(dtype=np.int64)
+        hashes = np.array([document_hash(doc) for doc in docs], dtype=HASH_DTYPE)
+
+        # Rows whose id and document hash both match the previous build keep their vector
+        reuse = np.zeros(len(car_ids), dtype=bool)
+        if self.previous is not None and len(self.previous.car_ids):
+            prev_ids = self.previous.car_ids
+            pos = np.searchsorted(prev_ids, car_ids).clip(max=len(prev_ids) - 1)
+            found = prev_ids[pos] == car_ids
+            reuse = found & (self.previous.hashes[pos] == hashes)
+            self.matched += int(found.sum())
+
+        to_encode = np.flatnonzero(~reuse)
+        embeddings = np.empty((len(car_ids), self.dimension()), dtype=np.float32)
+        if reuse.any():
+            embeddings[reuse] = self.previous.embeddings[pos[reuse]]
+        if len(to_encode):
+            embeddings[to_encode] = self.encode([docs[i] for i in to_encode])
+        self.encoded += len(to_encode)
+        self.skipped += int(reuse.sum())
+        return car_ids, embeddings, hashes
+
+
+def main(
+    db_path: Path,
+    model_name: str,
+    incremental: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+) -> None:
     if not db_path.exists():
         raise FileNotFoundError(f"Database not found at {db_path}")
 
+    print(f"📥 Streaming cars from {db_path} in chunks of {chunk_size}")
+    previous = load_previous_store(OUTPUT_BASE, model_name) if incremental else None
+    pipeline = EmbeddingPipeline(model_name, batch_size, previous, workers=workers)
+
     with sqlite3.connect(db_path) as conn:
-        query = "SELECT id, make, model, year, specs, price, currency, rating FROM cars"
-        df = pd.read_sql_query(query, conn)
-    return df
-
-
-def build_document(row: pd.Series) -> str:
-    parts: List[str] = []
-    parts.append(f"{row['make']} {row['model']}")
-    if row.get("year"):
-        parts.append(str(row["year"]))
-    try:
-        specs = json.loads(row["specs"]) if isinstance(row["specs"], str) else (row["specs"] or {})
-    except json.JSONDecodeError:
-        specs = {}
-
-    for key in ("bodyStyle", "engine", "fuelEconomy"):
-        value = specs.get(key)
-        if value:
-            parts.append(f"{key}: {value}")
-    if row.get("rating"):
-        parts.append(f"rating {row['rating']}")
-    if row.get("price"):
-        parts.append(f"price {row['price']} {row.get('currency', 'AED')}")
-    return " | ".join(parts)
-
-
-def main(db_path: Path, model_name: str) -> None:
-    print(f"📥 Loading cars from {db_path}")
-    df = load_cars(db_path)
-    if df.empty:
-        raise RuntimeError("No cars found to embed.")
-
-    print(f"🧠 Loading embedding model: {model_name}")
-    model = SentenceTransformer(model_name)
+        # One read transaction so the count and the streamed rows see the same snapshot
+        conn.execute("BEGIN")
+        total = count_cars(conn)
+        if not total:
+            raise RuntimeError("No cars found to embed.")
 
-    docs = [build_document(row) for _, row in df.iterrows()]
-    print(f"⚙️ Encoding {len(docs)} documents")
-    embeddings = model.encode(docs, normalize_embeddings=True)
+        writer = StoreWriter(OUTPUT_BASE, total, pipeline.dimension())
+        try:
+            for chunk in iter_car_chunks(conn, chunk_size):
+                writer.append(*pipeline.process(chunk))
+                print(f"⚙️ {writer.offset}/{total} cars processed")
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            pipeline.close()
+
+    deleted = len(previous.car_ids) - pipeline.matched if previous is not None else 0
+    if previous is not None and not pipeline.encoded and not deleted:
+        writer.abort()
+        print(f"✅ Embeddings already up to date ({total} cars)")
+        return
+
+    # Release the old memmap before its files are replaced
+    pipeline.previous = previous = None
+    writer.commit(model_name)
+    print(f"📊 Encoded {pipeline.encoded}, skipped {pipeline.skipped}, deleted {deleted}")
+    print(f"✅ Saved embeddings to {store_paths(OUTPUT_BASE)[0]}")
 
-    payload = [
-        {
-            "car_id": int(row["id"]),
-            "text": docs[idx],
-            "embedding": embeddings[idx].tolist(),
-        }
-        for idx, (_, row) in enumerate(df.iterrows())
-    ]
 
-    OUTPUT_PATH.write_text(json.dumps(payload))
-    print(f"✅ Saved embeddings to {OUTPUT_PATH}")
+def benchmark(
+    db_path: Path,
+    model_name: str,
+    sample_size: int,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    worker_counts: Sequence[int] = BENCHMARK_WORKERS,
+) -> Dict[int, float]:
+    """Encode the first ``sample_size`` documents with each worker count.
+
+    Returns documents/second per worker count. Pool start-up is excluded from
+    the timing since a real build pays it once per run.
+    """
+    with sqlite3.connect(db_path) as conn:
+        chunk = next(iter_car_chunks(conn, sample_size), None)
+    if chunk is None or chunk.empty:
+        raise RuntimeError("No cars found to benchmark.")
+    docs = build_documents(chunk).tolist()
+
+    results: Dict[int, float] = {}
+    model = SentenceTransformer(model_name)
+    for workers in worker_counts:
+        pipeline = EmbeddingPipeline(model_name, batch_size, None, workers=workers)
+        pipeline.model = model
+        try:
+            pipeline.encode(docs[: min(len(docs), batch_size * workers)])  # warm-up
+            started = time.perf_counter()
+            pipeline.encode(docs)
+            elapsed = time.perf_counter() - started
+        finally:
+            pipeline.close()
+        results[workers] = len(docs) / elapsed
+        print(f"⏱️ {workers} worker(s): {results[workers]:.1f} docs/s over {len(docs)} documents")
+    return results
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Build semantic embeddings for IntelliWheels cars")
     parser.add_argument("--db", type=Path, default=DEFAULT_DB)
     parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument(
+        "--from-json",
+        type=Path,
+        nargs="?",
+        const=LEGACY_JSON_PATH,
+        help="Convert a legacy car_embeddings.json into the binary store instead of encoding",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-encode cars whose document text changed since the last build",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Number of cars read from SQLite and processed per step",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Encoder batch size passed to SentenceTransformer.encode",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of encoder processes for CPU-only hosts",
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="SAMPLE_SIZE",
+        help="Report docs/s for 1, 2, 4 and 8 workers on SAMPLE_SIZE cars instead of building",
+    )
     args = parser.parse_args()
-    main(args.db, args.model)
+    if args.benchmark:
+        benchmark(args.db, args.model, args.benchmark, batch_size=args.batch_size)
+    elif args.from_json:
+        count = convert_json(args.from_json, OUTPUT_BASE, args.model)
+        print(f"✅ Converted {count} embeddings from {args.from_json}")
+    else:
+        main(
+            args.db,
+            args.model,
+            incremental=args.incremental,
+            chunk_size=args.chunk_size,
+            batch_size=args.batch_size,
+            workers=args.workers,
+        )
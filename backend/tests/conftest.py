@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+# Importing the app package builds an app; keep it from loading the models
+os.environ.setdefault('MODEL_WARMUP', 'off')
+
+from app import create_app  # noqa: E402
+from app.db import get_db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'test.db'),
+        # One pooled connection, so every request in a test runs on the
+        # connection the db fixture hands out
+        'DB_POOL_SIZE': 1,
+        'SESSION_REAPER_INTERVAL': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'QUERY_CACHE_MAX_BYTES': 0,
+        'QUERY_CACHE_SHARED': False,
+    })
+    yield app
+    app.extensions['db_pool'].close()
+    app.extensions['catalog_version'].close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    """The connection requests made through ``client`` run on."""
+    with app.app_context():
+        conn = get_db()
+    return conn
+
+
+@pytest.fixture
+def add_cars(db):
+    """Insert rows of (make, model, year, price, rating, created_at, specs JSON)."""
+    def add(rows):
+        db.executemany('''
+            INSERT INTO cars (make, model, year, price, rating, created_at, specs)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        db.commit()
+        db.execute('ANALYZE')
+    return add
+
+
+@pytest.fixture
+def statements(db):
+    """SQL run on the request connection, with parameters expanded."""
+    executed = []
+    db.set_trace_callback(executed.append)
+    yield executed
+    db.set_trace_callback(None)
+
+
+@pytest.fixture
+def explain(db):
+    """EXPLAIN QUERY PLAN details for a traced (parameter-expanded) statement."""
+    def plan(sql):
+        return [row['detail'] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    return plan
+
+
+@pytest.fixture
+def listing_plan(client, statements, explain):
+    """Fetch a /api/cars URL; return (listing SQL, its query plan), skipping the range probe."""
+    def fetch(url):
+        statements.clear()
+        assert client.get(url).status_code == 200
+        sql = [s for s in statements if 'FROM cars c' in s and not s.startswith('SELECT COUNT(*)')][-1]
+        return sql, explain(sql)
+    return fetch
@@ -0,0 +1,72 @@
+def signup(client, username):
+    response = client.post('/api/auth/signup', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'secret123'})
+    return response.get_json()['token']
+
+
+def test_session_stats_requires_admin(client, db):
+    assert client.get('/api/auth/sessions/stats').status_code == 401
+
+    token = signup(client, 'driver')
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/api/auth/sessions/stats', headers=headers).status_code == 403
+
+    db.execute("UPDATE users SET role = 'admin' WHERE username = 'driver'")
+    db.execute(
+        "INSERT INTO user_sessions (token, user_id, expires_at) VALUES ('old', 1, '2000-01-01 00:00:00')"
+    )
+    db.commit()
+    # The cached session only sees the role change at the next revocation
+    # poll (within a second); a fresh login sees it at once
+    login = client.post('/api/auth/login', json={'email': 'driver@example.com', 'password': 'secret123'})
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+    body = client.get('/api/auth/sessions/stats', headers=headers).get_json()
+    assert body['success'] is True
+    assert body['sessions']['expired'] == 1
+
+
+def test_session_stats_counts_expired_from_the_index(client, db, statements, explain):
+    token = signup(client, 'admin')
+    db.execute("UPDATE users SET role = 'admin'")
+    db.commit()
+    client.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'})
+    login = client.post('/api/auth/login', json={'email': 'admin@example.com', 'password': 'secret123'})
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+
+    statements.clear()
+    assert client.get('/api/auth/sessions/stats', headers=headers).status_code == 200
+    counts = [sql for sql in statements if 'COUNT(*)' in sql and 'user_sessions' in sql]
+    assert len(counts) == 1
+    assert any('idx_user_sessions_expires' in detail for detail in explain(counts[0]))
+
+
+def test_role_change_drops_cached_sessions(app, client, db):
+    # Check for revocations on every request instead of once a second
+    app.extensions['session_cache'].poll_interval = 0
+    db.execute("INSERT INTO users (username, email, password_hash, role) VALUES ('boss', 'boss@example.com', 'x', 'admin')")
+    db.execute("INSERT INTO user_sessions (token, user_id, expires_at) VALUES ('boss-token', 1, '2999-01-01 00:00:00')")
+    db.commit()
+    headers = {'Authorization': 'Bearer boss-token'}
+    assert client.get('/api/auth/sessions/stats', headers=headers).status_code == 200
+    assert client.get('/api/auth/sessions/stats', headers=headers).status_code == 200
+    assert app.extensions['session_cache'].stats()['hits'] >= 1
+
+    db.execute("UPDATE users SET role = 'user' WHERE id = 1")
+    db.commit()
+    assert client.get('/api/auth/sessions/stats', headers=headers).status_code == 403
+
+    db.execute('DELETE FROM users WHERE id = 1')
+    db.commit()
+    assert client.get('/api/auth/verify', headers=headers).status_code == 401
+
+
+def test_unrelated_user_updates_keep_the_cache(app, client, db):
+    app.extensions['session_cache'].poll_interval = 0
+    token = signup(client, 'driver')
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/api/auth/verify', headers=headers)
+    db.execute("UPDATE users SET password_hash = password_hash WHERE id = 1")
+    db.commit()
+    hits = app.extensions['session_cache'].stats()['hits']
+    client.get('/api/auth/verify', headers=headers)
+    assert app.extensions['session_cache'].stats()['hits'] == hits + 1
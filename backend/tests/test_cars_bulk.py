@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+
+def listing(make='Toyota', model='Camry', **extra):
+    return {'make': make, 'model': model, 'year': 2022, 'price': 95000, **extra}
+
+
+def test_mixed_batch_inserts_valid_rows_and_reports_the_rest(client, db):
+    response = client.post('/api/cars/bulk', json=[
+        listing(), {'model': 'No make'}, listing('BMW', 'X5', year=1700), listing('Kia', 'K5'),
+    ])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['inserted'], body['failed']) == (2, 2)
+    results = body['results']
+    assert results[1] == {'id': None, 'error': 'make is required'}
+    assert results[2] == {'id': None, 'error': 'Invalid year: 1700'}
+
+    # Returned ids are the rows inserted for those positions
+    rows = {row['id']: (row['make'], row['model']) for row in db.execute('SELECT id, make, model FROM cars')}
+    assert rows == {results[0]['id']: ('Toyota', 'Camry'), results[3]['id']: ('Kia', 'K5')}
+
+
+def test_ids_follow_input_order_in_a_large_batch(client, db):
+    cars = [listing(model=f'Model {i}') for i in range(500)]
+    results = client.post('/api/cars/bulk', json={'cars': cars}).get_json()['results']
+    models = dict(db.execute('SELECT id, model FROM cars').fetchall())
+    assert [models[result['id']] for result in results] == [car['model'] for car in cars]
+
+
+def test_atomic_batch_with_an_invalid_row_inserts_nothing(client, db):
+    response = client.post('/api/cars/bulk?atomic=1', json=[listing(), {'make': 'BMW'}, listing('Kia', 'K5')])
+    assert response.status_code == 400
+    body = response.get_json()
+    assert (body['inserted'], body['failed']) == (0, 1)
+    assert body['results'] == [{'id': None}, {'id': None, 'error': 'model is required'}, {'id': None}]
+    assert db.execute('SELECT COUNT(*) FROM cars').fetchone()[0] == 0
+
+
+def test_ndjson_reports_a_malformed_line_against_its_position(client, db):
+    lines = [json.dumps(listing()), '{"make": "BMW", "model": ', '', json.dumps(listing('Kia', 'K5'))]
+    response = client.post('/api/cars/bulk', data='\n'.join(lines), content_type='application/x-ndjson')
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    # Blank lines are skipped, not counted
+    assert len(results) == 3
+    assert results[1] == {'id': None, 'error': 'Invalid JSON'}
+    assert db.execute('SELECT make FROM cars WHERE id = ?', (results[2]['id'],)).fetchone()[0] == 'Kia'
+
+
+@pytest.mark.parametrize('field, value', [
+    ('price', 'Infinity'), ('price', '-Infinity'), ('price', 'NaN'), ('price', '-5'),
+    ('year', 'Infinity'), ('year', 'NaN'), ('year', '2022.5'),
+])
+def test_non_finite_or_out_of_range_numbers_are_rejected(client, db, field, value):
+    # NDJSON lines go through json.loads, which accepts NaN and Infinity
+    line = f'{{"make": "BMW", "model": "X5", "{field}": {value}}}'
+    response = client.post('/api/cars/bulk', data=line, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['results'][0]['error'].startswith(f'Invalid {field}')
+    assert db.execute('SELECT COUNT(*) FROM cars').fetchone()[0] == 0
+
+
+def test_oversized_batch_is_refused(client, app):
+    from app.routes.cars import MAX_CAR_BATCH
+    response = client.post('/api/cars/bulk', json=[listing()] * (MAX_CAR_BATCH + 1))
+    assert response.status_code == 413
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+BODY_STYLES = ('Sedan', 'SUV', 'Coupe')
+
+
+@pytest.fixture
+def catalog(add_cars):
+    # price 1000..3999 and horsepower 100..499 spread evenly, so a bound near
+    # either end matches a handful of cars and one past the other end all of them
+    add_cars(
+        (f'Make{i % 7}', f'Model{i}', 2000 + i % 25, 1000 + i, 3.5,
+         f'2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}',
+         json.dumps({'bodyStyle': BODY_STYLES[i % 3], 'horsepower': 100 + i % 400}))
+        for i in range(3000)
+    )
+
+
+def test_spec_columns_are_filled_from_specs(db, catalog):
+    row = db.execute('SELECT body_style, max_hp FROM cars WHERE id = 2').fetchone()
+    assert (row['body_style'], row['max_hp']) == ('SUV', 101)
+
+
+def test_body_style_reads_its_index_in_created_at_order(listing_plan, catalog):
+    sql, plan = listing_plan('/api/cars?body_style=suv')
+    assert 'INDEXED BY' not in sql
+    assert plan == ['SEARCH c USING INDEX idx_cars_body_style_created_at_id (body_style=?)']
+
+
+@pytest.mark.parametrize('url, index', [
+    ('/api/cars?price_max=1010', 'idx_cars_price'),
+    ('/api/cars?min_hp=499', 'idx_cars_max_hp'),
+    ('/api/cars?body_style=SUV&min_hp=499', 'idx_cars_max_hp'),
+])
+def test_rare_range_filter_forces_its_index(listing_plan, catalog, url, index):
+    sql, plan = listing_plan(url)
+    assert f'FROM cars c INDEXED BY {index} ' in sql
+    # The few matches are sorted in memory instead of walking created_at
+    assert plan[0].startswith(f'SEARCH c USING INDEX {index} ')
+    assert plan[1:] == ['USE TEMP B-TREE FOR ORDER BY']
+
+
+@pytest.mark.parametrize('url', ['/api/cars?price_max=900000', '/api/cars?min_hp=100'])
+def test_common_range_filter_walks_created_at(listing_plan, catalog, url):
+    sql, plan = listing_plan(url)
+    assert 'INDEXED BY' not in sql
+    assert plan == ['SCAN c USING INDEX idx_cars_created_at_id']
+
+
+def test_range_filters_return_the_matching_cars(client, catalog):
+    cars = client.get('/api/cars?price_max=1010&fields=id,price').get_json()['cars']
+    assert sorted(car['price'] for car in cars) == list(range(1000, 1011))
+    cars = client.get('/api/cars?min_hp=499&body_style=SUV&fields=id').get_json()['cars']
+    assert sorted(car['id'] for car in cars) == [800, 2000]
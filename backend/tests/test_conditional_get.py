@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+from app.services.catalog_version import CatalogVersion
+
+
+@pytest.fixture
+def catalog(add_cars):
+    add_cars([
+        ('BMW', 'X5', 2022, 250000, 4.5, '2024-01-01 00:00:00', '{}'),
+        ('Toyota', 'Camry', 2021, 90000, 4.0, '2024-01-02 00:00:00', '{}'),
+    ])
+
+
+def checkouts(app):
+    stats = app.extensions['db_pool'].stats()
+    return stats['created'] + stats['reused']
+
+
+@pytest.mark.parametrize('url', ['/api/cars?make=BMW', '/api/cars/1'])
+def test_not_modified_runs_no_sql(app, client, statements, catalog, url):
+    etag = client.get(url).headers['ETag']
+    statements.clear()
+    before = checkouts(app)
+
+    response = client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert statements == []
+    assert checkouts(app) == before
+
+
+def test_catalog_write_changes_the_etag(app, client, catalog):
+    etag = client.get('/api/cars').headers['ETag']
+    assert client.post('/api/cars', json={'make': 'Kia', 'model': 'K5'}).status_code == 201
+    response = client.get('/api/cars', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_ignores_parameter_order_only(client, catalog):
+    etag = client.get('/api/cars?search=X5&make=BMW').headers['ETag']
+    assert client.get('/api/cars?make=BMW&search=X5').headers['ETag'] == etag
+    # An encoded & inside a value is not a second parameter
+    smuggled = client.get('/api/cars?make=BMW%26search%3DX5')
+    assert smuggled.get_json()['cars'] == []
+    assert smuggled.headers['ETag'] != etag
+
+
+def test_poll_never_moves_the_version_backwards(app, db):
+    version = CatalogVersion(app.config['DATABASE'], poll_interval=0.01)
+    db.execute('UPDATE catalog_version SET version = 5 WHERE id = 1')
+    db.commit()
+    assert version.refresh(db) == 5
+
+    # A poll that read the counter before that write finishes afterwards
+    class StaleRead:
+        def execute(self, sql):
+            return db.execute('SELECT 4')
+    assert version.refresh(StaleRead()) == 5
+    assert version.value == 5
+
+
+def test_close_stops_the_poller(app):
+    version = CatalogVersion(app.config['DATABASE'], poll_interval=0.01)
+    version.current()
+    poller = version._thread
+    assert poller.is_alive()
+    version.close()
+    poller.join(timeout=1)
+    assert not poller.is_alive()
+
+
+def test_poller_stops_when_the_database_is_removed(tmp_path):
+    path = tmp_path / 'gone.db'
+    sqlite3.connect(path).close()
+    version = CatalogVersion(str(path), poll_interval=0.01)
+    version.current()
+    poller = version._thread
+    path.unlink()
+    poller.join(timeout=1)
+    assert not poller.is_alive()
+    assert not path.exists()
@@ -0,0 +1,107 @@
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+
+import pytest
+
+
+def export_rows(count):
+    return (
+        (f'Make{i % 20}', f'Model{i % 300}', 2000 + i % 25, 20000 + i, 4.0,
+         f'2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}',
+         json.dumps({'bodyStyle': 'SUV', 'seats': 5, 'notes': 'full service history'}))
+        for i in range(count)
+    )
+
+
+@pytest.fixture
+def catalog(db, add_cars):
+    add_cars(export_rows(50))
+    # Cars 41-50 were edited after the rest
+    db.execute("UPDATE cars SET updated_at = '2024-01-01 00:00:00'")
+    db.execute("UPDATE cars SET updated_at = '2025-06-01 12:00:00' WHERE id > 40")
+    db.commit()
+
+
+def stream_size(client, url, headers=None):
+    """Consume an export chunk by chunk, keeping only its size."""
+    response = client.get(url, headers=headers or {}, buffered=False)
+    assert response.status_code == 200
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+    return size, lines
+
+
+def test_ndjson_has_one_car_per_line(client, catalog):
+    response = client.get('/api/cars/export')
+    assert response.mimetype == 'application/x-ndjson'
+    cars = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [car['id'] for car in cars] == list(range(1, 51))
+    assert cars[0]['make'] == 'Make0'
+    assert cars[0]['specs']['seats'] == 5
+
+
+def test_csv_has_a_header_and_one_row_per_car(client, catalog):
+    response = client.get('/api/cars/export?format=csv&fields=make,price')
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['id', 'make', 'price']
+    assert rows[1] == ['1', 'Make0', '20000.0']
+    assert len(rows) == 51
+
+
+@pytest.mark.parametrize('since', ['2025-01-01', '2025-06-01T12:00:00', '2025-06-01T16:00:00%2B04:00'])
+def test_updated_since_returns_only_later_edits(client, catalog, since):
+    body = client.get(f'/api/cars/export?fields=id&updated_since={since}').get_data(as_text=True)
+    assert [json.loads(line)['id'] for line in body.splitlines()] == list(range(41, 51))
+
+
+@pytest.mark.parametrize('url', [
+    '/api/cars/export?updated_since=yesterday',
+    '/api/cars/export?format=xml',
+    '/api/cars/export?fields=nope',
+])
+def test_bad_parameters_are_rejected(client, catalog, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_gzip_decodes_to_the_plain_export(client, catalog):
+    plain = client.get('/api/cars/export').get_data()
+    response = client.get('/api/cars/export', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert len(response.get_data()) < len(plain)
+    assert gzip.decompress(response.get_data()) == plain
+
+
+def assert_streams_in_bounded_memory(client, count, bound):
+    tracemalloc.start()
+    try:
+        size, lines = stream_size(client, '/api/cars/export')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert lines == count
+    # Python never holds more than a few batches, however big the export
+    assert peak < bound < size
+
+
+def test_export_streams_in_bounded_memory(client, add_cars):
+    add_cars(export_rows(30000))
+    response = client.get('/api/cars/export', buffered=False)
+    assert response.is_streamed
+    response.close()
+    assert_streams_in_bounded_memory(client, 30000, 6 * 1024 * 1024)
+
+
+@pytest.mark.slow
+def test_million_row_export_streams_in_bounded_memory(client, add_cars):
+    add_cars(export_rows(1_000_000))
+    assert_streams_in_bounded_memory(client, 1_000_000, 6 * 1024 * 1024)
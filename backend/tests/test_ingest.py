@@ -0,0 +1,29 @@
+from ingest_excel_to_db import SQL_DUMP_PATH, SQL_DUMP_TABLE, load_sql_dump
+
+DUMP = """
+CREATE TABLE `middle_east_gcc_car_database_sample` (
+  `make` varchar(50),
+  `model` varchar(50)
+);
+CREATE TABLE `dealers` (
+  `name` varchar(50),
+  `city` varchar(50)
+);
+INSERT INTO `middle_east_gcc_car_database_sample` VALUES ('Toyota','Land Cruiser'),('Nissan','Patrol');
+INSERT INTO `dealers` VALUES ('Al Futtaim','Dubai');
+INSERT INTO `middle_east_gcc_car_database_sample` (`make`, `model`) VALUES ('Lexus','LX 600; V6');
+"""
+
+
+def test_table_filter_skips_other_tables(tmp_path):
+    path = tmp_path / 'dump.sql'
+    path.write_text(DUMP)
+    assert len(list(load_sql_dump(path))) == 4
+    rows = list(load_sql_dump(path, table=SQL_DUMP_TABLE))
+    assert [row['model'] for row in rows] == ['Land Cruiser', 'Patrol', 'LX 600; V6']
+
+
+def test_sample_dump_parses():
+    rows = list(load_sql_dump(SQL_DUMP_PATH, table=SQL_DUMP_TABLE))
+    assert rows
+    assert all({'Make', 'Model', 'Year'} <= row.keys() for row in rows)
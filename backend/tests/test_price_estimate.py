@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.mark.parametrize('body', ['[1, 2]', '"BMW"', '42', 'null', '{not json'])
+def test_estimate_rejects_a_body_that_is_not_an_object(client, body):
+    response = client.post('/api/price-estimate', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_estimate_requires_make_model_and_year(client):
+    response = client.post('/api/price-estimate', json={'make': 'BMW'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('body', [[], {'listings': []}])
+def test_empty_batch_is_an_empty_result(client, body):
+    response = client.post('/api/price-estimate/batch', json=body)
+    assert response.status_code == 200
+    assert response.get_json()['estimates'] == []
+
+
+def test_batch_reports_invalid_items_by_position(client):
+    response = client.post('/api/price-estimate/batch', json=[1, 'BMW', None, {'make': 'BMW'}])
+    assert response.status_code == 200
+    errors = [item['error'] for item in response.get_json()['estimates']]
+    assert errors == ['Listing must be an object'] * 3 + ['make, model and year are required']
+
+
+@pytest.mark.parametrize('body', ['{"listings": 3}', '"BMW"', '{not json'])
+def test_batch_without_a_list_is_rejected(client, body):
+    response = client.post('/api/price-estimate/batch', data=body, content_type='application/json')
+    assert response.status_code == 400
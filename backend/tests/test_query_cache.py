@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from app import create_app
+from app.services.query_cache import QueryCache
+
+
+def test_shared_tier_stays_within_its_bound(tmp_path):
+    path = str(tmp_path / 'query_cache.db')
+    cache = QueryCache(max_bytes=1024, shared_path=path, shared_max_entries=5)
+    for i in range(50):
+        cache.put(f'/api/cars?page={i}', 1, b'{}')
+
+    conn = sqlite3.connect(path)
+    keys = {row[0] for row in conn.execute('SELECT key FROM query_cache')}
+    conn.close()
+    assert len(keys) == 5
+    assert '/api/cars?page=49' in keys
+
+
+def test_shared_tier_drops_older_versions(tmp_path):
+    path = str(tmp_path / 'query_cache.db')
+    cache = QueryCache(max_bytes=1024, shared_path=path)
+    cache.put('/api/cars?', 1, b'old')
+    cache.put('/api/makes?', 2, b'new')
+
+    other_worker = QueryCache(max_bytes=1024, shared_path=path)
+    assert other_worker.get('/api/cars?', 1) is None
+    assert other_worker.get('/api/makes?', 2) == b'new'
+
+
+@pytest.fixture
+def cached_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': str(tmp_path / 'test.db'),
+        'SESSION_REAPER_INTERVAL': 0,
+        'QUERY_CACHE_SHARED_PATH': str(tmp_path / 'query_cache.db'),
+    })
+    yield app
+    app.extensions['db_pool'].close()
+    app.extensions['catalog_version'].close()
+
+
+def test_encoded_parameters_get_their_own_entry(cached_app):
+    client = cached_app.test_client()
+    assert client.post('/api/cars', json={'make': 'BMW', 'model': 'X5'}).status_code == 201
+
+    assert len(client.get('/api/cars?make=BMW&search=X5').get_json()['cars']) == 1
+    # Same text once decoded, but one make value that matches nothing
+    assert client.get('/api/cars?make=BMW%26search%3DX5').get_json()['cars'] == []
+    assert cached_app.extensions['query_cache'].stats()['hits'] == 0
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+from app.services.session_reaper import SessionReaper
+
+
+def test_reap_deletes_only_expired_sessions(db):
+    db.execute("INSERT INTO users (username, email, password_hash) VALUES ('u', 'u@example.com', 'x')")
+    db.executemany('INSERT INTO user_sessions (token, user_id, expires_at) VALUES (?, 1, ?)', [
+        ('old-1', '2000-01-01 00:00:00'), ('old-2', '2000-01-02 00:00:00'), ('live', '2999-01-01 00:00:00')])
+    db.commit()
+    reaper = SessionReaper(batch_size=1)
+    assert reaper.reap(db) == 2
+    assert reaper.last_table_size == 1
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_worker_gets_its_own_thread(app):
+    reaper = SessionReaper(interval=3600)
+    reaper.start(app.config['DATABASE'])
+    parent_thread = reaper._thread
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # What post_fork does in a preloaded gunicorn worker
+            reaper.start(app.config['DATABASE'])
+            ok = not parent_thread.is_alive() and reaper._thread.is_alive() and reaper._pid == os.getpid()
+            os.write(write_end, b'1' if ok else b'0')
+        finally:
+            sys.stdout.flush()
+            os._exit(0)
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 1) == b'1'
+    # A second start in the same process keeps the running thread
+    reaper.start(app.config['DATABASE'])
+    assert reaper._thread is parent_thread